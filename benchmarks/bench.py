@@ -0,0 +1,216 @@
+"""Benchmarks of gizio on synthetic GIZMO snapshots.
+
+Synthetic snapshots of each size are written to a scratch directory, then
+every case is timed on freshly loaded snapshots. Reported are the best wall
+time over repeats, throughput in particles or bytes per second, and the
+peak memory allocated during a separate traced run.
+
+Usage::
+
+    python benchmarks/bench.py --sizes 1e4 1e5 1e6
+    python benchmarks/bench.py --json base.json
+    python benchmarks/bench.py --compare base.json --tolerance 1.25
+
+With ``--compare``, exits with status 1 if any case is slower than the
+baseline by more than the tolerance factor.
+"""
+import argparse
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import gizio
+from gizio.synthetic import write_snapshot
+
+
+def _direct_keys(snap):
+    return [key for key in snap.keys() if snap.shape[key[0]] > 0]
+
+
+def setup_load(prefix):
+    return prefix
+
+
+def run_load(prefix):
+    snap = gizio.load(prefix)
+    n_part = int(sum(snap.shape.values()))
+    snap.close()
+    return n_part, "part"
+
+
+def setup_getitem(prefix):
+    return gizio.load(prefix)
+
+
+def run_getitem(snap):
+    n_bytes = 0
+    for key in _direct_keys(snap):
+        n_bytes += snap[key].nbytes
+    snap.clear_cache()
+    return n_bytes, "B"
+
+
+def setup_derived(prefix):
+    snap = gizio.load(prefix)
+    for key in _direct_keys(snap):
+        snap[key]
+    return snap
+
+
+def run_derived(snap):
+    gas = snap.pt["gas"]
+    star = snap.pt["star"]
+    gas["t"]
+    star["age"]
+    del gas["t"]
+    del star["age"]
+    return len(gas) + len(star), "part"
+
+
+def setup_mask_ops(prefix):
+    snap = gizio.load(prefix)
+    gas = snap.pt["gas"]
+    t = gas["t"].to_value("K")
+    return gas, gas[t > np.median(t)], gas[t < np.percentile(t, 25)]
+
+
+def run_mask_ops(selectors):
+    gas, hot_gas, cold_gas = selectors
+    for ps in [
+        hot_gas | cold_gas,
+        hot_gas & cold_gas,
+        gas - hot_gas,
+        (gas - cold_gas) ^ hot_gas,
+    ]:
+        len(ps)
+    return 4 * len(gas), "part"
+
+
+def setup_selector(prefix):
+    snap = gizio.load(prefix)
+    gas = snap.pt["gas"]
+    gas["p"]
+    snap.spatial_index("PartType0")
+    mask = gas["rho"].d > np.median(gas["rho"].d)
+    return gas, mask, snap.header["box_size"].d / 2
+
+
+def run_selector(state):
+    gas, mask, half = state
+    gas[mask]
+    gas.sphere([half] * 3, half / 2)
+    gas.box([0.0] * 3, [half] * 3)
+    return 3 * len(gas), "part"
+
+
+CASES = {
+    "load": (setup_load, run_load),
+    "getitem": (setup_getitem, run_getitem),
+    "derived": (setup_derived, run_derived),
+    "mask_ops": (setup_mask_ops, run_mask_ops),
+    "selector": (setup_selector, run_selector),
+}
+
+
+def measure(prefix, setup, run, repeat):
+    """Time a case and trace its peak memory.
+
+    Returns
+    -------
+    dict
+        Best time in s, amount processed per second with its unit, and peak
+        traced memory in bytes.
+
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        state = setup(prefix)
+        start = time.perf_counter()
+        amount, unit = run(state)
+        best = min(best, time.perf_counter() - start)
+        del state
+    state = setup(prefix)
+    tracemalloc.start()
+    run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "time": best,
+        "throughput": amount / best,
+        "unit": unit + "/s",
+        "peak": peak,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", type=float, default=[1e4, 1e5])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES))
+    parser.add_argument("--n-file", type=int, default=1)
+    parser.add_argument("--chunks", type=int)
+    parser.add_argument("--compression")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dir", help="scratch directory for snapshots")
+    parser.add_argument("--json", help="write results to a JSON file")
+    parser.add_argument("--compare", help="baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.TemporaryDirectory(dir=args.dir)
+    results = {}
+    print(f"{'case':24}{'time':>12}{'throughput':>19}{'peak':>12}")
+    for size in args.sizes:
+        size = int(size)
+        # Mix resembling a zoom-in run, with 1% stars
+        n_part = {
+            "gas": size,
+            "hdm": size,
+            "ldm": size // 4,
+            "star": size // 100,
+            "bh": 1,
+        }
+        prefix = Path(scratch.name) / f"snapshot_{size}"
+        write_snapshot(
+            prefix,
+            n_part,
+            n_file=args.n_file,
+            chunks=args.chunks,
+            compression=args.compression,
+        )
+        for name in args.cases or list(CASES):
+            key = f"{name}[{size}]"
+            result = measure(prefix, *CASES[name], args.repeat)
+            results[key] = result
+            print(
+                f"{key:24}{result['time'] * 1e3:>10.2f}ms"
+                f"{result['throughput']:>12.3g} {result['unit']:<6}"
+                f"{result['peak'] / 2 ** 20:>10.1f}MB"
+            )
+    scratch.cleanup()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = [
+            key
+            for key, result in results.items()
+            if key in baseline
+            and result["time"] > baseline[key]["time"] * args.tolerance
+        ]
+        for key in regressions:
+            ratio = results[key]["time"] / baseline[key]["time"]
+            print(f"regression: {key} {ratio:.2f}x slower than baseline")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
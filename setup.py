@@ -21,7 +21,8 @@ setup(
     packages=find_packages("src"),
     package_dir={"": "src"},
     python_requires=">=3.6",
-    install_requires=["astropy", "h5py", "numpy", "unyt"],
+    install_requires=["astropy", "h5py", "numpy>=1.17", "unyt"],
+    extras_require={"lazy": ["dask[array]"]},
     # https://pypi.org/classifiers/
     classifiers=[
         "Intended Audience :: Science/Research",
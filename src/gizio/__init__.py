@@ -1,4 +1,7 @@
 """The gizio package."""
 from .__about__ import __version__, __author__
 
-from .core import load
+from .core import load, load_cache
+from .ids import match
+from .parallel import parallel_map
+from .series import load_series
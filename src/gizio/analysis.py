@@ -0,0 +1,628 @@
+"""Streaming statistics of particle selectors."""
+import abc
+
+import numpy as np
+
+from .lazy import is_lazy
+
+
+def _accumulator(dtype):
+    """Data type accumulating sums of an input data type."""
+    if dtype.kind == "u":
+        return np.uint64
+    if dtype.kind in "bi":
+        return np.int64
+    return np.float64
+
+
+class Reduction(abc.ABC):
+    """Statistic computed from partial states combined over chunks.
+
+    A state is None for an empty chunk, which is the identity of combine.
+
+    Attributes
+    ----------
+    weighted : bool
+        Whether the statistic takes a weight field.
+
+    """
+
+    weighted = False
+
+    @abc.abstractmethod
+    def partial(self, values, weights=None):
+        """Compute the partial state of a non-empty chunk.
+
+        Parameters
+        ----------
+        values : numpy.ndarray
+            Field values of the chunk, reduced along the first axis.
+        weights : numpy.ndarray, optional
+            Weight values of the chunk. (default: None)
+
+        Returns
+        -------
+        tuple
+            The partial state.
+
+        """
+
+    @abc.abstractmethod
+    def merge(self, state1, state2):
+        """Merge two non-empty partial states."""
+
+    def combine(self, state1, state2):
+        """Combine two partial states.
+
+        Parameters
+        ----------
+        state1, state2 : tuple or None
+            Partial states.
+
+        Returns
+        -------
+        tuple or None
+            The combined state.
+
+        """
+        if state1 is None:
+            return state2
+        if state2 is None:
+            return state1
+        return self.merge(state1, state2)
+
+    def finalize(self, state):
+        """Compute the statistic from the total state.
+
+        Parameters
+        ----------
+        state : tuple or None
+            The total state.
+
+        Returns
+        -------
+        numpy.ndarray
+            The statistic, NaN for an empty selection.
+
+        """
+        if state is None:
+            return np.asarray(np.nan)
+        return np.asarray(self.result(state))
+
+    def result(self, state):
+        """Compute the statistic from a non-empty total state."""
+        return state[0]
+
+    def unit(self, unit, weight_unit=None):
+        """Unit of the statistic.
+
+        Parameters
+        ----------
+        unit : unyt.Unit
+            Field unit.
+        weight_unit : unyt.Unit, optional
+            Weight unit, multiplied in if the statistic is weighted.
+            (default: None)
+
+        Returns
+        -------
+        unyt.Unit
+            The unit.
+
+        """
+        if self.weighted and weight_unit is not None:
+            return unit * weight_unit
+        return unit
+
+
+class Count(Reduction):
+    """Number of particles."""
+
+    def partial(self, values, weights=None):
+        return (len(values),)
+
+    def merge(self, state1, state2):
+        return (state1[0] + state2[0],)
+
+    def finalize(self, state):
+        return np.asarray(0 if state is None else state[0])
+
+    def unit(self, unit, weight_unit=None):
+        return None
+
+
+class Sum(Reduction):
+    """Sum, or weighted sum of field times weight."""
+
+    def __init__(self, weighted=False):
+        self.weighted = weighted
+
+    def partial(self, values, weights=None):
+        if self.weighted:
+            values = values * _column(weights, values)
+        return (values.sum(axis=0, dtype=_accumulator(values.dtype)),)
+
+    def merge(self, state1, state2):
+        return (state1[0] + state2[0],)
+
+    def finalize(self, state):
+        if state is None:
+            return np.asarray(0.0)
+        return np.asarray(state[0])
+
+
+class Extremum(Reduction):
+    """Minimum or maximum."""
+
+    def __init__(self, ufunc):
+        self.ufunc = ufunc
+
+    def partial(self, values, weights=None):
+        return (self.ufunc.reduce(values, axis=0),)
+
+    def merge(self, state1, state2):
+        return (self.ufunc(state1[0], state2[0]),)
+
+
+class Moments(Reduction):
+    """Mean, variance or standard deviation, optionally weighted.
+
+    States are (total weight, mean, sum of squared deviations), merged by
+    the pairwise update of Chan et al., which is numerically stable.
+
+    """
+
+    def __init__(self, moment, weighted=False):
+        self.moment = moment
+        self.weighted = weighted
+
+    def partial(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64)
+        if self.weighted:
+            weights = _column(np.asarray(weights, dtype=np.float64), values)
+            total = weights.sum(axis=0)
+            if not np.all(total > 0):
+                return None
+            mean = (weights * values).sum(axis=0) / total
+            m2 = (weights * (values - mean) ** 2).sum(axis=0)
+        else:
+            total = np.float64(len(values))
+            mean = values.mean(axis=0)
+            m2 = ((values - mean) ** 2).sum(axis=0)
+        return total, mean, m2
+
+    def merge(self, state1, state2):
+        total1, mean1, m21 = state1
+        total2, mean2, m22 = state2
+        total = total1 + total2
+        delta = mean2 - mean1
+        mean = mean1 + delta * (total2 / total)
+        m2 = m21 + m22 + delta ** 2 * (total1 * total2 / total)
+        return total, mean, m2
+
+    def result(self, state):
+        total, mean, m2 = state
+        if self.moment == "mean":
+            return mean
+        var = m2 / total
+        return var if self.moment == "var" else np.sqrt(var)
+
+    def unit(self, unit, weight_unit=None):
+        return unit ** 2 if self.moment == "var" else unit
+
+
+def _evaluate(ps, keys, units):
+    """Evaluate fields as raw arrays, in units recorded on first use."""
+    values = {}
+    for key in keys:
+        value = ps[key]
+        if is_lazy(value):
+            value = value.compute()
+        if hasattr(value, "units"):
+            if key not in units:
+                units[key] = value.units
+            value = value.to_value(units[key])
+        values[key] = np.asarray(value)
+    return values
+
+
+def _column(weights, values):
+    """Broadcast per-row weights against values."""
+    return weights.reshape((-1,) + (1,) * (values.ndim - 1))
+
+
+REDUCTIONS = {
+    "count": Count(),
+    "sum": Sum(),
+    "min": Extremum(np.minimum),
+    "max": Extremum(np.maximum),
+    "mean": Moments("mean"),
+    "var": Moments("var"),
+    "std": Moments("std"),
+    "wsum": Sum(weighted=True),
+    "wmean": Moments("mean", weighted=True),
+    "wvar": Moments("var", weighted=True),
+    "wstd": Moments("std", weighted=True),
+}
+
+
+def reduce(ps, ops, chunk_size=1 << 20):
+    """Compute statistics of fields by streaming over chunks of particles.
+
+    Fields are evaluated on subsets from
+    :meth:`gizio.core.ParticleSelector.iter_subsets`, so derived fields must
+    be computed row by row. Partial results are combined across chunks, so
+    peak memory is bounded by the chunk size.
+
+    Parameters
+    ----------
+    ps : gizio.core.ParticleSelector
+        The particle selector.
+    ops : dict
+        Statistics to compute, mapping a field key, or a (field, weight) key
+        pair for weighted statistics, to a reduction name or a list of them.
+        Reductions are "count", "sum", "min", "max", "mean", "var" and "std",
+        and weighted "wsum", "wmean", "wvar" and "wstd". Vector fields are
+        reduced per component.
+    chunk_size : int, optional
+        Maximum number of file rows per chunk. (default: 1048576)
+
+    Returns
+    -------
+    dict
+        Results keyed like ops, each a unyt quantity or array, or a
+        dictionary of them keyed by reduction name if a list was given.
+        Without selected particles, sums and counts are zero and other
+        statistics are NaN, all without units.
+
+    """
+    # Validate requests
+    requests = []
+    for key, names in ops.items():
+        weighted = isinstance(key, tuple)
+        field, weight = key if weighted else (key, None)
+        for name in [names] if isinstance(names, str) else names:
+            if name not in REDUCTIONS:
+                raise ValueError(f"unknown reduction {name!r}")
+            reduction = REDUCTIONS[name]
+            if name != "count" and reduction.weighted != weighted:
+                expected = "(field, weight) pair" if not weighted else "field"
+                raise ValueError(f"reduction {name!r} requires a {expected}")
+            requests += [(key, name, field, weight, reduction)]
+    keys = []
+    for _, name, field, weight, _ in requests:
+        if name != "count":
+            keys += [k for k in (field, weight) if k is not None]
+    keys = list(dict.fromkeys(keys))
+
+    # Stream partial states
+    states = {(key, name): None for key, name, *_ in requests}
+    units = {}
+    for subset in ps.iter_subsets(chunk_size):
+        values = _evaluate(subset, keys, units)
+        for key, name, field, weight, reduction in requests:
+            if name == "count":
+                state = (len(subset),)
+            else:
+                state = reduction.partial(values[field], values.get(weight))
+            states[key, name] = reduction.combine(states[key, name], state)
+
+    # Finalize with units
+    results = {}
+    for key, name, field, weight, reduction in requests:
+        value = reduction.finalize(states[key, name])
+        if name != "count" and field in units:
+            unit = reduction.unit(units[field], units.get(weight))
+            if value.ndim == 0:
+                value = ps.snap.quantity(value, unit)
+            else:
+                value = ps.snap.array(value, unit)
+        elif value.ndim == 0:
+            value = value[()]
+        if isinstance(ops[key], str):
+            results[key] = value
+        else:
+            results.setdefault(key, {})[name] = value
+    return results
+
+
+class Histogram:
+    """Weighted N-dimensional histogram of particles.
+
+    Parameters
+    ----------
+    fields : list
+        Keys of the binned fields.
+    edges : list
+        Bin edges of each field.
+    log : list
+        Whether bins of each field are spaced logarithmically.
+    counts : numpy.ndarray
+        Number of particles in each bin.
+    sums : dict
+        Binned sums of weights.
+
+    Attributes
+    ----------
+    fields : list
+        Keys of the binned fields.
+    edges : list
+        Bin edges of each field, as unyt arrays in field units.
+    log : list
+        Whether bins of each field are spaced logarithmically.
+    counts : numpy.ndarray
+        Number of particles in each bin.
+    sums : dict
+        Binned sums keyed like the weights, of the weight field for a key, or
+        of the field times the weight for a (field, weight) pair.
+
+    """
+
+    def __init__(self, fields, edges, log, counts, sums):
+        self.fields = fields
+        self.edges = edges
+        self.log = log
+        self.counts = counts
+        self.sums = sums
+
+    @property
+    def centers(self):
+        """list: Bin centers of each field, geometric for log bins."""
+        return [
+            np.sqrt(edges[1:] * edges[:-1])
+            if is_log
+            else (edges[1:] + edges[:-1]) / 2
+            for edges, is_log in zip(self.edges, self.log)
+        ]
+
+    def mean(self, field, weight=None):
+        """Binned mean of a field, NaN in empty bins.
+
+        Parameters
+        ----------
+        field : str
+            The field key, summed as a weight.
+        weight : str, optional
+            The weight key. The field must be summed as a (field, weight)
+            pair. (default: unweighted)
+
+        Returns
+        -------
+        unyt.array.unyt_array
+            The mean in each bin.
+
+        """
+        if weight is None:
+            total, norm = self.sums[field], self.counts
+        else:
+            total, norm = self.sums[field, weight], self.sums[weight]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return total / norm
+
+
+def _scan_limits(ps, keys, log, chunk_size, units):
+    """Scan minimum and maximum values, positive ones for log bins."""
+    limits = {key: [np.inf, -np.inf] for key in keys}
+    if not keys:
+        return limits
+    for subset in ps.iter_subsets(chunk_size):
+        values = _evaluate(subset, keys, units)
+        for key in keys:
+            value = values[key]
+            if log[key]:
+                value = value[value > 0]
+            if len(value):
+                limits[key][0] = min(limits[key][0], value.min())
+                limits[key][1] = max(limits[key][1], value.max())
+    return limits
+
+
+def _bin_edges(nbin, lim, is_log, unit):
+    """Bin edges from explicit edges, or a number of bins and limits."""
+    if np.ndim(nbin) == 1:
+        return _to_units(nbin, unit).astype(np.float64)
+    lo, hi = (float(_to_units(value, unit)) for value in lim)
+    if lo > hi:
+        # Nothing scanned
+        lo, hi = (1.0, 10.0) if is_log else (0.0, 1.0)
+    if is_log:
+        return np.logspace(np.log10(lo), np.log10(hi), nbin + 1)
+    return np.linspace(lo, hi, nbin + 1)
+
+
+def _to_units(value, unit):
+    """Raw value in a unit, if given with units."""
+    if hasattr(value, "units") and unit is not None:
+        return value.to_value(unit)
+    return np.asarray(value)
+
+
+def _bin_indices(values, edges):
+    """Bin indices of values, -1 outside the edges."""
+    indices = np.searchsorted(edges, values, side="right") - 1
+    # The last edge is inclusive
+    indices[values == edges[-1]] = len(edges) - 2
+    indices[(indices < 0) | (indices >= len(edges) - 1)] = -1
+    return indices
+
+
+def histogram(
+    ps,
+    fields,
+    bins=64,
+    bounds=None,
+    log=False,
+    weights=(),
+    chunk_size=1 << 20,
+):
+    """Compute a weighted N-dimensional histogram by streaming over chunks.
+
+    Each chunk is binned with one :func:`numpy.bincount` per sum, so no
+    per-bin masks are built and memory is bounded by the chunk size and the
+    number of bins.
+
+    Parameters
+    ----------
+    ps : gizio.core.ParticleSelector
+        The particle selector.
+    fields : list
+        Keys of the binned scalar fields.
+    bins : int or array_like or list, optional
+        Number of bins or bin edges, possibly a unyt array. A list gives one
+        entry per field. (default: 64)
+    bounds : list, optional
+        Per-field (lo, hi) limits for numbers of bins, possibly with units,
+        or None. Limits not given are scanned by an extra pass, the maximum
+        included. (default: None)
+    log : bool or list, optional
+        Whether numbers of bins are spaced logarithmically. A list gives one
+        entry per field. (default: False)
+    weights : list, optional
+        Weights summed in each bin, each a field key, or a (field, weight)
+        pair to sum the field times the weight. (default: counts only)
+    chunk_size : int, optional
+        Maximum number of file rows per chunk. (default: 1048576)
+
+    Returns
+    -------
+    Histogram
+        The histogram. Particles outside the edges are dropped.
+
+    """
+    fields = list(fields)
+    weights = list(weights)
+    n_dim = len(fields)
+    if not isinstance(bins, list):
+        bins = [bins] * n_dim
+    if bounds is None:
+        bounds = [None] * n_dim
+    if not isinstance(log, list):
+        log = [log] * n_dim
+    keys = list(fields)
+    for weight in weights:
+        keys += list(weight) if isinstance(weight, tuple) else [weight]
+    keys = list(dict.fromkeys(keys))
+
+    units = {}
+    scan = [
+        key
+        for key, nbin, lim in zip(fields, bins, bounds)
+        if np.ndim(nbin) == 0 and lim is None
+    ]
+    limits = _scan_limits(
+        ps, scan, dict(zip(fields, log)), chunk_size, units
+    )
+    for key in scan:
+        # Include the maximum in the last bin
+        limits[key][1] = np.nextafter(limits[key][1], np.inf)
+    shape = tuple(
+        len(nbin) - 1 if np.ndim(nbin) == 1 else nbin for nbin in bins
+    )
+    size = int(np.prod(shape))
+
+    edges = None
+    counts = np.zeros(size, dtype=np.int64)
+    sums = {weight: np.zeros(size) for weight in weights}
+    for subset in ps.iter_subsets(chunk_size):
+        values = _evaluate(subset, keys, units)
+        if edges is None:
+            # Field units are known from here on
+            edges = [
+                _bin_edges(nbin, limits.get(key, lim), is_log, units.get(key))
+                for key, nbin, lim, is_log in zip(fields, bins, bounds, log)
+            ]
+
+        # Flat bin index of each particle
+        flat = np.zeros(len(subset), dtype=np.int64)
+        inside = np.ones(len(subset), dtype=bool)
+        for key, edge, n_bin in zip(fields, edges, shape):
+            indices = _bin_indices(values[key], edge)
+            inside &= indices >= 0
+            flat = flat * n_bin + indices
+        flat = flat[inside]
+        counts += np.bincount(flat, minlength=size)
+        for weight in weights:
+            if isinstance(weight, tuple):
+                value = values[weight[0]] * values[weight[1]]
+            else:
+                value = values[weight]
+            sums[weight] += np.bincount(
+                flat, weights=value[inside], minlength=size
+            )
+    if edges is None:
+        edges = [
+            _bin_edges(nbin, limits.get(key, lim), is_log, None)
+            for key, nbin, lim, is_log in zip(fields, bins, bounds, log)
+        ]
+
+    # Attach units
+    edges = [
+        ps.snap.array(edge, units[key]) if key in units else edge
+        for key, edge in zip(fields, edges)
+    ]
+    for weight in weights:
+        unit = None
+        for key in weight if isinstance(weight, tuple) else (weight,):
+            if key in units:
+                unit = units[key] if unit is None else unit * units[key]
+        value = sums[weight].reshape(shape)
+        sums[weight] = value if unit is None else ps.snap.array(value, unit)
+    return Histogram(fields, edges, log, counts.reshape(shape), sums)
+
+
+def profile(
+    ps,
+    field,
+    fields,
+    weight=None,
+    bins=64,
+    bounds=None,
+    log=False,
+    chunk_size=1 << 20,
+):
+    """Compute binned means of fields along a field in one pass.
+
+    Parameters
+    ----------
+    ps : gizio.core.ParticleSelector
+        The particle selector.
+    field : str
+        Key of the binned scalar field, e.g. radius.
+    fields : list
+        Keys of the averaged scalar fields.
+    weight : str, optional
+        Key of the weight field. (default: unweighted)
+    bins : int or array_like, optional
+        Number of bins or bin edges, possibly a unyt array. (default: 64)
+    bounds : tuple, optional
+        (lo, hi) limits of the number of bins, possibly with units.
+        (default: scanned by an extra pass)
+    log : bool, optional
+        Whether the number of bins is spaced logarithmically.
+        (default: False)
+    chunk_size : int, optional
+        Maximum number of file rows per chunk. (default: 1048576)
+
+    Returns
+    -------
+    edges : unyt.array.unyt_array
+        Bin edges.
+    means : dict
+        Mean of each field in each bin, NaN in empty bins.
+
+    """
+    if weight is None:
+        weights = list(fields)
+    else:
+        weights = [(key, weight) for key in fields] + [weight]
+    hist = histogram(
+        ps,
+        [field],
+        bins=[bins],
+        bounds=None if bounds is None else [bounds],
+        log=log,
+        weights=weights,
+        chunk_size=chunk_size,
+    )
+    means = {key: hist.mean(key, weight) for key in fields}
+    return hist.edges[0], means
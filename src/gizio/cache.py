@@ -0,0 +1,313 @@
+"""Memory-budgeted field caches."""
+from collections import OrderedDict, namedtuple
+from collections.abc import MutableMapping
+from itertools import count
+import mmap
+import threading
+import weakref
+
+import numpy as np
+
+
+CacheInfo = namedtuple(
+    "CacheInfo", ["hits", "misses", "evictions", "currsize", "maxsize"]
+)
+CacheInfo.__doc__ = """Cache statistics, with sizes in bytes."""
+
+
+class CacheBudget:
+    """Byte budget shared by several field caches.
+
+    Entries of all attached caches are evicted together in least recently
+    used order once the total size exceeds the budget. Evicted entries are
+    released to weak references. Entries still referenced outside the cache
+    are in use, releasing them does not free memory, so they stay available
+    and accounted until their last reference is dropped.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Maximum total size of cached values in bytes. (default: unbounded)
+
+    Attributes
+    ----------
+    max_bytes : int or None
+        Maximum total size of cached values in bytes.
+
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._tokens = count()
+        self._caches = {}
+        self._lru = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._currsize = 0
+
+    def info(self):
+        """Report cache statistics.
+
+        Returns
+        -------
+        CacheInfo
+            Hit, miss and eviction counts with current and maximum sizes.
+
+        """
+        with self._lock:
+            return CacheInfo(
+                self._hits,
+                self._misses,
+                self._evictions,
+                self._currsize,
+                self.max_bytes,
+            )
+
+    def usage(self, level=None):
+        """Total size of cached values in bytes.
+
+        Parameters
+        ----------
+        level : str, optional
+            Only count caches of this level. (default: all levels)
+
+        Returns
+        -------
+        int
+            The size in bytes.
+
+        """
+        with self._lock:
+            usage = 0
+            for (token, _), nbytes in list(self._lru.items()):
+                cache = self._caches.get(token, lambda: None)()
+                if cache is not None and level in (None, cache.level):
+                    usage += nbytes
+            return usage
+
+    def _attach(self, cache):
+        with self._lock:
+            token = next(self._tokens)
+            self._caches[token] = weakref.ref(cache)
+        weakref.finalize(cache, self._detach, token)
+        return token
+
+    def _detach(self, token):
+        with self._lock:
+            for entry in [entry for entry in self._lru if entry[0] == token]:
+                self._currsize -= self._lru.pop(entry)
+            self._caches.pop(token, None)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def _touch(self, token, key):
+        with self._lock:
+            self._lru.move_to_end((token, key))
+
+    def _add(self, token, key, nbytes):
+        with self._lock:
+            self._remove(token, key)
+            self._lru[token, key] = nbytes
+            self._currsize += nbytes
+            self._evict()
+
+    def _remove(self, token, key):
+        with self._lock:
+            if (token, key) in self._lru:
+                self._currsize -= self._lru.pop((token, key))
+
+    def _expire(self, token, key):
+        """Drop a released entry once its value is freed."""
+        with self._lock:
+            cache = self._caches.get(token, lambda: None)()
+            if cache is not None:
+                cache._released.pop(key, None)
+            if (token, key) in self._lru:
+                self._remove(token, key)
+                self._evictions += 1
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        for token, key in list(self._lru):
+            if self._currsize <= self.max_bytes:
+                break
+            cache = self._caches.get(token, lambda: None)()
+            if cache is None:
+                # Owner being garbage collected
+                continue
+            if key in cache._data:
+                # Expires at once unless in use elsewhere
+                cache._release(key)
+
+
+class FieldCache(MutableMapping):
+    """Field cache accounted against a shared byte budget.
+
+    Parameters
+    ----------
+    budget : CacheBudget
+        The shared budget.
+    level : str
+        Cache level name used in usage reports.
+
+    Attributes
+    ----------
+    budget : CacheBudget
+        The shared budget.
+    level : str
+        Cache level name used in usage reports.
+
+    """
+
+    def __init__(self, budget, level):
+        self.budget = budget
+        self.level = level
+        self._data = {}
+        # Finalizers of released values still in use, by key
+        self._released = {}
+        self._token = budget._attach(self)
+
+    def _lookup(self, key):
+        """Cached or released value, or None if absent."""
+        if key in self._data:
+            return self._data[key]
+        if key in self._released:
+            alive = self._released[key].peek()
+            if alive is not None:
+                return alive[0]
+        return None
+
+    def _release(self, key):
+        """Hold a value weakly, expiring its entry once it is freed."""
+        value = self._data.pop(key)
+        try:
+            self._released[key] = weakref.finalize(
+                value, self.budget._expire, self._token, key
+            )
+        except TypeError:
+            # Not weakly referenceable, dropped at once
+            self.budget._expire(self._token, key)
+        del value
+
+    def _discard(self, key):
+        """Forget a key without expiring it."""
+        self._data.pop(key, None)
+        finalizer = self._released.pop(key, None)
+        if finalizer is not None:
+            finalizer.detach()
+
+    def get(self, key, default=None):
+        """Retrieve a value and record a cache hit or miss.
+
+        Parameters
+        ----------
+        key : typing.Hashable
+            The key.
+        default : object, optional
+            Returned on a miss. (default: None)
+
+        Returns
+        -------
+        object
+            The cached value, or default on a miss.
+
+        """
+        with self.budget._lock:
+            value = self._lookup(key)
+            self.budget._count(value is not None)
+            if value is None:
+                return default
+            self.budget._touch(self._token, key)
+            return value
+
+    def peek(self, key):
+        """Retrieve a value without recording a hit or miss.
+
+        Parameters
+        ----------
+        key : typing.Hashable
+            The key.
+
+        Returns
+        -------
+        object
+            The cached value, or None if absent.
+
+        """
+        with self.budget._lock:
+            value = self._lookup(key)
+            if value is not None:
+                self.budget._touch(self._token, key)
+            return value
+
+    def record(self, hit):
+        """Record a cache hit or miss of a lookup made by peeking.
+
+        Parameters
+        ----------
+        hit : bool
+            Whether the lookup hit.
+
+        """
+        self.budget._count(hit)
+
+    def __getitem__(self, key):
+        with self.budget._lock:
+            value = self._lookup(key)
+            if value is None:
+                raise KeyError(key)
+            self.budget._touch(self._token, key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self.budget._lock:
+            self._discard(key)
+            self._data[key] = value
+            self.budget._add(self._token, key, _nbytes(value))
+
+    def __delitem__(self, key):
+        with self.budget._lock:
+            if self._lookup(key) is None:
+                raise KeyError(key)
+            self._discard(key)
+            self.budget._remove(self._token, key)
+
+    def __contains__(self, key):
+        with self.budget._lock:
+            return self._lookup(key) is not None
+
+    def __iter__(self):
+        with self.budget._lock:
+            return iter([key for key in self._keys() if key in self])
+
+    def __len__(self):
+        with self.budget._lock:
+            return sum(key in self for key in self._keys())
+
+    def _keys(self):
+        return list(self._data) + list(self._released)
+
+    def clear(self):
+        with self.budget._lock:
+            for key in list(self):
+                del self[key]
+
+
+def _nbytes(value):
+    """Heap memory held by a cached value, none for lazy or mapped arrays."""
+    if hasattr(value, "dask"):
+        return 0
+    base = value
+    while base is not None:
+        if isinstance(base, (np.memmap, mmap.mmap)):
+            return 0
+        base = getattr(base, "base", None)
+    return getattr(value, "nbytes", 0)
@@ -0,0 +1,297 @@
+"""Snapshot metadata catalog."""
+from collections import OrderedDict, namedtuple
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+FieldInfo = namedtuple(
+    "FieldInfo",
+    ["dtype", "shape", "chunks", "compression", "counts", "offsets"],
+)
+FieldInfo.__doc__ = """Layout of a field across snapshot files.
+
+Attributes
+----------
+dtype : numpy.dtype
+    Data type on file.
+shape : tuple
+    Shape of the field concatenated over all files.
+chunks : tuple or None
+    HDF5 chunk shape, or None if stored contiguously.
+compression : str or None
+    HDF5 compression filter name.
+counts : list
+    Number of rows in each file.
+offsets : list
+    Byte offset of the contiguous dataset in each file, or None where the
+    dataset is chunked, absent or not allocated.
+"""
+
+
+class Catalog:
+    """Snapshot metadata gathered in a single pass over files.
+
+    Parameters
+    ----------
+    headers : list
+        Per-file header attribute dictionaries.
+    fields : collections.OrderedDict
+        Field layouts composed of {(ptype, field): FieldInfo} entries.
+
+    Attributes
+    ----------
+    headers : list
+        Per-file header attribute dictionaries.
+    fields : collections.OrderedDict
+        Field layouts composed of {(ptype, field): FieldInfo} entries.
+
+    """
+
+    VERSION = 1
+
+    def __init__(self, headers, fields):
+        self.headers = headers
+        self.fields = fields
+
+    @classmethod
+    def scan(cls, files, header_block, ptypes):
+        """Build a catalog by visiting each file once.
+
+        Parameters
+        ----------
+        files : FilePool
+            Snapshot files.
+        header_block : str
+            Name of the header group.
+        ptypes : list
+            Particle types in specification order.
+
+        Returns
+        -------
+        Catalog
+            The catalog.
+
+        """
+
+        def scan_file(_, h5f):
+            datasets = {}
+            for ptype in ptypes:
+                if ptype in h5f:
+                    for field, dset in h5f[ptype].items():
+                        datasets[ptype, field] = (
+                            dset.dtype,
+                            dset.shape,
+                            dset.chunks,
+                            dset.compression,
+                            dset.id.get_offset(),
+                        )
+            return dict(h5f[header_block].attrs), datasets
+
+        scans = files.map(scan_file)
+        headers = [header for header, _ in scans]
+
+        # Merge per-file layouts, keeping ptype order
+        keys = []
+        for ptype in ptypes:
+            for _, datasets in scans:
+                for key in datasets:
+                    if key[0] == ptype and key not in keys:
+                        keys += [key]
+        fields = OrderedDict()
+        for key in keys:
+            layouts = [datasets.get(key) for _, datasets in scans]
+            first = next(layout for layout in layouts if layout is not None)
+            dtype, shape, chunks, compression, _ = first
+            counts = [
+                layout[1][0] if layout is not None else 0
+                for layout in layouts
+            ]
+            offsets = [
+                layout[4] if layout is not None else None
+                for layout in layouts
+            ]
+            fields[key] = FieldInfo(
+                dtype,
+                (sum(counts),) + shape[1:],
+                chunks,
+                compression,
+                counts,
+                offsets,
+            )
+        return cls(headers, fields)
+
+    @classmethod
+    def read(cls, files, header_block, ptypes, sidecar=None):
+        """Load a catalog from a valid sidecar file, or scan the files.
+
+        A freshly scanned catalog is saved to the sidecar when possible.
+
+        Parameters
+        ----------
+        files : FilePool
+            Snapshot files.
+        header_block : str
+            Name of the header group.
+        ptypes : list
+            Particle types in specification order.
+        sidecar : str or pathlib.Path, optional
+            Sidecar file path. (default: no sidecar)
+
+        Returns
+        -------
+        Catalog
+            The catalog.
+
+        """
+        if sidecar is not None:
+            catalog = cls.load(sidecar, files.paths)
+            if catalog is not None:
+                return catalog
+        catalog = cls.scan(files, header_block, ptypes)
+        if sidecar is not None:
+            catalog.save(sidecar, files.paths)
+        return catalog
+
+    def ptype_fields(self, ptype):
+        """Available fields of a particle type.
+
+        Parameters
+        ----------
+        ptype : str
+            The particle type.
+
+        Returns
+        -------
+        list
+            Raw field names.
+
+        """
+        return [field for (key, field) in self.fields if key == ptype]
+
+    # sidecar
+
+    @staticmethod
+    def _stamp(paths):
+        stamps = []
+        for path in paths:
+            stat = os.stat(path)
+            stamps += [[str(path), stat.st_size, stat.st_mtime_ns]]
+        return stamps
+
+    def save(self, path, paths):
+        """Save to a sidecar file keyed by snapshot file sizes and mtimes.
+
+        Failures, e.g. on read-only file systems, are silently ignored.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            Sidecar file path.
+        paths : list
+            Snapshot file paths.
+
+        """
+        content = {
+            "version": self.VERSION,
+            "files": self._stamp(paths),
+            "headers": [
+                {key: _encode(value) for key, value in header.items()}
+                for header in self.headers
+            ],
+            "fields": [
+                {
+                    "key": list(key),
+                    "dtype": info.dtype.str,
+                    "shape": list(info.shape),
+                    "chunks": info.chunks and list(info.chunks),
+                    "compression": info.compression,
+                    "counts": list(map(int, info.counts)),
+                    "offsets": [
+                        offset if offset is None else int(offset)
+                        for offset in info.offsets
+                    ],
+                }
+                for key, info in self.fields.items()
+            ],
+        }
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(content, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError):
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    @classmethod
+    def load(cls, path, paths):
+        """Load from a sidecar file if it matches the snapshot files.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            Sidecar file path.
+        paths : list
+            Snapshot file paths.
+
+        Returns
+        -------
+        Catalog or None
+            The catalog, or None if the sidecar is missing or stale.
+
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (
+            content.get("version") != cls.VERSION
+            or content.get("files") != cls._stamp(paths)
+        ):
+            return None
+        headers = [
+            {key: _decode(value) for key, value in header.items()}
+            for header in content["headers"]
+        ]
+        fields = OrderedDict()
+        for item in content["fields"]:
+            fields[tuple(item["key"])] = FieldInfo(
+                np.dtype(item["dtype"]),
+                tuple(item["shape"]),
+                item["chunks"] and tuple(item["chunks"]),
+                item["compression"],
+                item["counts"],
+                item["offsets"],
+            )
+        return cls(headers, fields)
+
+
+def _encode(value):
+    """Encode a header attribute as JSON-compatible data."""
+    if isinstance(value, (np.ndarray, np.generic)):
+        value = np.asarray(value)
+        if value.dtype.kind == "S":
+            data = np.char.decode(value, "latin-1").tolist()
+        else:
+            data = value.tolist()
+        return {"dtype": value.dtype.str, "data": data}
+    if isinstance(value, str):
+        return {"dtype": "str", "data": value}
+    raise TypeError(f"cannot encode header attribute {value!r}")
+
+
+def _decode(item):
+    """Decode a header attribute encoded by _encode."""
+    if item["dtype"] == "str":
+        return item["data"]
+    dtype = np.dtype(item["dtype"])
+    if dtype.kind == "S":
+        return np.char.encode(np.asarray(item["data"]), "latin-1").astype(
+            dtype
+        )[()]
+    return np.asarray(item["data"], dtype=dtype)[()]
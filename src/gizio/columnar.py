@@ -0,0 +1,87 @@
+"""Columnar snapshot cache files."""
+import json
+import os
+from pathlib import Path
+
+import h5py
+
+from .spec import SPEC_REGISTRY
+
+
+# Suffix of cache files, never read as snapshot files
+CACHE_SUFFIX = ".gizio.hdf5"
+# Attributes of the cache file root group
+SPEC_ATTR = "gizio_spec"
+UNIT_SPEC_ATTR = "gizio_unit_spec"
+# Attribute of cached datasets
+UNIT_ATTR = "gizio_unit"
+
+
+def export_cache(snap, path, chunk_size=1 << 20):
+    """Export a snapshot to a single-file columnar cache.
+
+    The cache keeps the snapshot file layout in a single file, with a merged
+    header and every field stored as one contiguous, uncompressed dataset,
+    so it can be memory-mapped. The specification name, its unit system and
+    field units are stored as attributes. Fields are stored in the data types
+    the snapshot serves them in, and copied in chunks, so memory is bounded
+    by the chunk size. Cache files never overwrite snapshot files, and are
+    skipped when snapshot files are globbed.
+
+    Parameters
+    ----------
+    snap : gizio.core.Snapshot
+        The snapshot.
+    path : str or pathlib.Path
+        Cache directory, written to ``<stem>.gizio.hdf5`` there, or cache
+        file path if it has a suffix.
+    chunk_size : int, optional
+        Maximum number of rows copied at a time. (default: 1048576)
+
+    Returns
+    -------
+    pathlib.Path
+        The cache file path.
+
+    """
+    path = Path(path).expanduser()
+    if not path.suffix:
+        path.mkdir(parents=True, exist_ok=True)
+        path = path / (snap.paths[0].name.split(".")[0] + CACHE_SUFFIX)
+    if path.resolve() in [Path(p).resolve() for p in snap.paths]:
+        raise ValueError(f"{path} is a file of the snapshot")
+    spec = snap.spec
+    # Exact class match, a subclass may change the format and must not be
+    # reloaded as its registered parent
+    names = [
+        name for name, cls in SPEC_REGISTRY.items() if spec.__class__ is cls
+    ]
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        with h5py.File(tmp_path, "w") as h5f:
+            h5f.attrs[SPEC_ATTR] = names[0] if names else ""
+            h5f.attrs[UNIT_SPEC_ATTR] = json.dumps(spec.UNIT_SPEC)
+            header = h5f.create_group(spec.HEADER_BLOCK)
+            for key, value in spec.merge_headers(snap.catalog).items():
+                header.attrs[key] = value
+            for (ptype, field), info in snap.catalog.fields.items():
+                # Contiguous layout, allocated before writing
+                dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
+                dcpl.set_alloc_time(h5py.h5d.ALLOC_TIME_EARLY)
+                dtype = snap.field_dtype(field, info.dtype)
+                dset = h5f.require_group(ptype).create_dataset(
+                    field, info.shape, dtype, dcpl=dcpl
+                )
+                dset.attrs[UNIT_ATTR] = str(snap._field_unit(field))
+                start = 0
+                for chunk in snap.iter_chunks(ptype, [field], chunk_size):
+                    value = chunk[field].d
+                    dset[start : start + len(value)] = value
+                    start += len(value)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return path
+
@@ -1,6 +1,8 @@
 """Core interface."""
 from collections import OrderedDict
 from copy import copy, deepcopy
+import json
+from operator import and_, or_, sub, xor
 import os
 from pathlib import Path
 
@@ -8,10 +10,22 @@ import h5py
 import numpy as np
 import unyt
 
-from .spec import SPEC_REGISTRY
-
-
-def load(prefix, suffix=".hdf5", spec="gizmo"):
+from . import analysis
+from . import lazy as lazy_module
+from .cache import CacheBudget, FieldCache, _nbytes
+from .columnar import CACHE_SUFFIX, SPEC_ATTR, UNIT_SPEC_ATTR, export_cache
+from .cosmology import age_table
+from .frame import FRAME_FIELDS, Frame
+from .ids import IDIndex
+from .kernel import FieldKernel
+from .mask import Mask
+from .pool import FilePool
+from .spatial import SpatialIndex
+from .spec import SPEC_REGISTRY, resolve_dtype
+from .stats import StatsCollector, span
+
+
+def load(prefix, suffix=".hdf5", spec="gizmo", **kwargs):
     """Load snapshot.
 
     Parameters
@@ -23,6 +37,11 @@ def load(prefix, suffix=".hdf5", spec="gizmo"):
     spec : str or SpecBase, optional
         Snapshot format specification. If given as str, will use a built-in
         one. (default: "gizmo")
+    **kwargs
+        Snapshot options such as ``max_open_files``, ``chunk_cache``,
+        ``cache_bytes``, ``n_workers``, ``sidecar``, ``lazy`` and ``mmap``.
+        See
+        :class:`Snapshot`.
 
     Returns
     -------
@@ -30,7 +49,27 @@ def load(prefix, suffix=".hdf5", spec="gizmo"):
         The loaded snapshot.
 
     """
-    # Determine snapshot paths
+    if isinstance(spec, str):
+        spec = SPEC_REGISTRY[spec]()
+    return Snapshot(snapshot_paths(prefix, suffix), spec, **kwargs)
+
+
+def snapshot_paths(prefix, suffix=".hdf5"):
+    """Find the files of a snapshot.
+
+    Parameters
+    ----------
+    prefix : str or pathlib.Path
+        Snapshot file(s) prefix.
+    suffix : str, optional
+        Snapshot file(s) suffix. (default: ".hdf5")
+
+    Returns
+    -------
+    list
+        Sorted snapshot file paths, without columnar cache files.
+
+    """
     prefix = Path(prefix).expanduser().resolve()
     if prefix.is_dir():
         # Directory case
@@ -43,10 +82,87 @@ def load(prefix, suffix=".hdf5", spec="gizmo"):
         if not prefix.is_file():
             # Glob prefix case
             glob_pattern += "*" + suffix
-    paths = sorted(parent.glob(glob_pattern))
-    if isinstance(spec, str):
-        spec = SPEC_REGISTRY[spec]()
-    return Snapshot(paths, spec)
+    return sorted(
+        path
+        for path in parent.glob(glob_pattern)
+        if not path.name.endswith(CACHE_SUFFIX)
+    )
+
+
+def load_cache(path, spec=None, **kwargs):
+    """Load a columnar snapshot cache.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Cache file path.
+    spec : SpecBase, optional
+        Snapshot format specification. (default: the built-in one stored in
+        the cache, with the stored unit system)
+    **kwargs
+        Snapshot options. Fields are memory-mapped unless ``mmap`` is given.
+        See :class:`Snapshot`.
+
+    Returns
+    -------
+    Snapshot
+        The loaded snapshot.
+
+    """
+    path = Path(path).expanduser().resolve()
+    if spec is None:
+        with h5py.File(path, "r") as h5f:
+            name = h5f.attrs[SPEC_ATTR]
+            unit_spec = json.loads(h5f.attrs[UNIT_SPEC_ATTR])
+        if name not in SPEC_REGISTRY:
+            raise ValueError("cache of an unregistered spec, pass spec")
+        spec = SPEC_REGISTRY[name]()
+        if unit_spec != spec.UNIT_SPEC:
+            spec.UNIT_SPEC = unit_spec
+    kwargs.setdefault("mmap", True)
+    return Snapshot([path], spec, **kwargs)
+
+
+# Maximum number of contiguous runs read as a single hyperslab selection
+_MAX_HYPERSLABS = 1024
+
+# Number of rows per buffered block when scanning scattered selections
+_SCAN_ROWS = 1 << 20
+
+
+def _read_rows(dset, mask, offset, out, column=None):
+    """Read rows of a dataset, or of one column, selected by a mask range."""
+    starts, stops = mask.runs(offset, offset + len(dset))
+    if len(starts) <= _MAX_HYPERSLABS:
+        # Union of hyperslabs read in one call
+        corner = (0,) * (dset.ndim - 1)
+        tail = dset.shape[1:]
+        if column is not None:
+            corner = (column,) + corner[1:]
+            tail = (1,) + tail[1:]
+        fspace = dset.id.get_space()
+        fspace.select_none()
+        for start, stop in zip(starts, stops):
+            fspace.select_hyperslab(
+                (int(start),) + corner,
+                (int(stop - start),) + tail,
+                op=h5py.h5s.SELECT_OR,
+            )
+        mspace = h5py.h5s.create_simple(out.shape)
+        dset.id.read(mspace, fspace, out)
+    else:
+        # Scattered selection, scan the spanned rows with a bounded buffer
+        left = 0
+        for start in range(starts[0], stops[-1], _SCAN_ROWS):
+            stop = min(start + _SCAN_ROWS, stops[-1])
+            sub_block = mask.block(offset + start, offset + stop)
+            n_sel = int(sub_block.sum())
+            if n_sel > 0:
+                rows = slice(start, stop)
+                if column is not None:
+                    rows = (rows, column)
+                out[left : left + n_sel] = dset[rows][sub_block]
+                left += n_sel
 
 
 class Snapshot:
@@ -54,20 +170,79 @@ class Snapshot:
 
     .. describe:: snap[key]
     .. describe:: snap[ptype, field]
+    .. describe:: snap[ptype, field, column]
 
-        Load the field from file and cache in memory.
+        Load the field from file and cache in memory. With a column, only
+        that column of a multi-component field is read, by hyperslab
+        selection, and cached separately. It is sliced from the full field
+        instead if that is cached.
 
     .. describe:: del snap[key]
     .. describe:: del snap[ptype, field]
+    .. describe:: del snap[ptype, field, column]
 
         Delete the cache.
 
+    .. describe:: with snap:
+
+        Close the pooled file handles on exit.
+
     Parameters
     ----------
     paths : typing.Iterable
         Snapshot file paths in correct order.
     spec : SpecBase
         Snapshot format specification.
+    max_open_files : int, optional
+        Maximum number of file handles kept open. (default: 16)
+    chunk_cache : dict, optional
+        h5py raw data chunk cache settings, any of ``rdcc_nbytes``,
+        ``rdcc_nslots`` and ``rdcc_w0``. (default: h5py defaults)
+    cache_bytes : int, optional
+        Byte budget shared by the snapshot and particle selector field caches.
+        Least recently used fields not in use elsewhere are evicted beyond it.
+        (default: unbounded)
+    n_workers : int, optional
+        Number of threads reading files of multi-file snapshots concurrently.
+        (default: 1)
+    sidecar : bool or str or pathlib.Path, optional
+        Cache the metadata catalog in a sidecar file, keyed by snapshot file
+        sizes and modification times. If True, use ``<prefix>.gizio.json``.
+        (default: False)
+    lazy : bool, optional
+        Return fields as Dask arrays with units, one chunk per file, which
+        derived fields and selections compose lazily. Requires dask.
+        (default: False)
+    mmap : bool, optional
+        Map fields stored contiguously and uncompressed as copy-on-write
+        :class:`numpy.memmap` arrays instead of reading them into memory. A
+        field held by a single file is a zero-copy view, whose pages are
+        loaded on access, shared with other processes and left to the OS
+        page cache. Other fields fall back to normal reads. (default: False)
+    catalog : gizio.catalog.Catalog, optional
+        Metadata catalog of the files, skipping the file scan. (default: read
+        from the files or the sidecar)
+    stats : bool or callable or gizio.stats.StatsCollector, optional
+        Collect bytes read, wall time per stage, and per-field lookup counts
+        with cache hits and misses, reported by :meth:`stats`. A callable is
+        also called with each :class:`gizio.stats.Event`, e.g. to feed a
+        tracer. A collector may be shared by several snapshots.
+        (default: False)
+    dtype : str or numpy.dtype, optional
+        Data type policy of all fields, overriding the spec ones:
+        ``"native"`` keeps stored data types, ``"downcast"`` reads double as
+        single precision, ``"upcast"`` reads single as double precision, and
+        a data type casts to it. Reads convert while copying out of files.
+        Derived fields keep the precision of their inputs unless a policy
+        applies to their key. (default: the spec policies)
+    field_dtypes : dict, optional
+        Data type policies by raw field name, field abbreviation or derived
+        field key, overriding ``dtype``, e.g. ``{"p": "float32"}``.
+        (default: none)
+    id_sidecar : bool, optional
+        Persist particle ID indices next to the snapshot files, as
+        ``<prefix>.<ptype>.ids.npz`` keyed by file sizes and modification
+        times. (default: False)
 
     Attributes
     ----------
@@ -77,29 +252,124 @@ class Snapshot:
         Common prefix of paths without trailing dot.
     spec : SpecBase
         Snapshot format specification.
+    files : FilePool
+        Pooled file handles, in paths order.
+    sidecar : pathlib.Path or None
+        Metadata catalog sidecar file path.
+    catalog : gizio.catalog.Catalog
+        Metadata catalog of available fields and their layouts.
     header : dict
         Snapshot header.
     shape : collections.OrderedDict
         Data shape composed of {ptype_name: n_part} entries, in the
         specification ptypes order.
+    file_shapes : list
+        Per-file data shapes, in the same format as ``shape``.
     cosmology : astropy.cosmology.LambdaCDM
         An astropy cosmology calculator.
     unit_registry : unyt.unit_registry.UnitRegistry
         Simulation unit registry.
     pt : dict
         Dictionary of particle type selectors.
+    partial_read_density : float
+        Mask density below which particle selectors read only the selected
+        rows of a direct field instead of loading and caching it whole.
+    lazy : bool
+        Whether fields are Dask arrays.
+    mmap : bool
+        Whether contiguous uncompressed fields are memory-mapped.
+    collector : gizio.stats.StatsCollector or None
+        Statistics collector, if enabled.
+    dtype : str or numpy.dtype or None
+        Data type policy of all fields.
+    field_dtypes : dict
+        Data type policies by raw field name or derived field key.
+    id_sidecar : bool
+        Whether particle ID indices are persisted next to the snapshot.
 
     """
 
-    def __init__(self, paths, spec):
+    def __init__(
+        self,
+        paths,
+        spec,
+        max_open_files=16,
+        chunk_cache=None,
+        cache_bytes=None,
+        n_workers=1,
+        sidecar=False,
+        lazy=False,
+        mmap=False,
+        catalog=None,
+        stats=False,
+        dtype=None,
+        field_dtypes=None,
+        id_sidecar=False,
+    ):
+        if lazy:
+            lazy_module._require()
+        if isinstance(stats, StatsCollector):
+            self.collector = stats
+        elif callable(stats):
+            self.collector = StatsCollector([stats])
+        else:
+            self.collector = StatsCollector() if stats else None
         self.paths = [Path(path).resolve() for path in paths]
         self.prefix = os.path.commonprefix(self.paths).rstrip(".")
+        self.files = FilePool(
+            self.paths, max_open_files, chunk_cache, n_workers, self.collector
+        )
+        if sidecar is True:
+            self.sidecar = Path(self.prefix + ".gizio.json")
+        else:
+            self.sidecar = Path(sidecar) if sidecar else None
+        self.partial_read_density = 0.1
+        self.lazy = lazy
+        self.mmap = mmap
+        self.dtype = dtype
+        self.field_dtypes = dict(field_dtypes) if field_dtypes else {}
+        self.id_sidecar = id_sidecar
+        self._options = dict(
+            max_open_files=max_open_files,
+            chunk_cache=chunk_cache,
+            cache_bytes=cache_bytes,
+            n_workers=n_workers,
+            sidecar=sidecar,
+            lazy=lazy,
+            mmap=mmap,
+            # Callbacks stay in this process
+            stats=self.collector is not None,
+            dtype=dtype,
+            field_dtypes=field_dtypes,
+            id_sidecar=id_sidecar,
+        )
+
+        # Initialize field cache
+        self._cache_budget = CacheBudget(cache_bytes)
+        self._field_cache = FieldCache(self._cache_budget, "snapshot")
+        self._spatial_indices = {}
+        self._id_indices = {}
 
         # Apply spec to extract meta info
-        header, shape, cosmology, unit_registry = spec.apply_to(self)
+        (
+            catalog,
+            header,
+            shape,
+            file_shapes,
+            cosmology,
+            unit_registry,
+        ) = spec.apply_to(self, catalog)
         self.spec = spec
+        self.catalog = catalog
+        # Key dtype policies by raw field name
+        raw_fields = {abbr: raw for raw, abbr in spec.field_abbrs.items()}
+        self.field_dtypes = {
+            raw_fields.get(field, field): policy
+            for field, policy in self.field_dtypes.items()
+        }
         self.header = header
         self.shape = shape
+        self.file_shapes = file_shapes
         self.cosmology = cosmology
         self.unit_registry = unit_registry
 
@@ -112,21 +382,20 @@ class Snapshot:
         self.pt["all"] = ParticleSelector.from_ptypes(self, self.spec.ptypes)
         self.spec.register_derived_fields(self.pt["all"], "all")
 
-        # Initialize field cache
-        self._field_cache = {}
+    def __reduce__(self):
+        # Send paths, spec, catalog and options, neither caches nor handles
+        options = dict(self._options, catalog=self.catalog)
+        return (
+            _rebuild_snapshot,
+            ([str(path) for path in self.paths], self.spec, options),
+            {"partial_read_density": self.partial_read_density},
+        )
 
     # dictionay interface
 
     def keys(self):
         """A list of available keys."""
-        keys = []
-        # It suffices to check the first file
-        with h5py.File(self.paths[0], "r") as f:
-            for ptype in self.spec.ptypes:
-                if ptype in f:
-                    for field in f[ptype].keys():
-                        keys += [(ptype, field)]
-        return keys
+        return list(self.catalog.fields.keys())
 
     def cached_keys(self):
         """A list of cached keys."""
@@ -134,34 +403,464 @@ class Snapshot:
 
     def clear_cache(self):
         """Clear field cache."""
-        self._field_cache = {}
+        self._field_cache.clear()
+
+    def memory_usage(self):
+        """Report memory used by field caches.
+
+        Returns
+        -------
+        dict
+            Cached bytes of the snapshot level, of all particle selectors
+            and in total.
+
+        """
+        return {
+            "snapshot": self._cache_budget.usage("snapshot"),
+            "selectors": self._cache_budget.usage("selector"),
+            "total": self._cache_budget.usage(),
+        }
+
+    def cache_info(self):
+        """Report field cache statistics across all levels.
+
+        Returns
+        -------
+        gizio.cache.CacheInfo
+            Hit, miss and eviction counts with current and maximum sizes in
+            bytes.
+
+        """
+        return self._cache_budget.info()
+
+    def stats(self):
+        """Report I/O and compute statistics.
+
+        See :class:`gizio.stats.StatsCollector` for the recorded stages.
+
+        Returns
+        -------
+        gizio.stats.Stats
+            Calls, wall time and bytes read per stage, and lookup calls,
+            cache hits and misses, wall time and bytes read per field key.
+
+        """
+        if self.collector is None:
+            raise ValueError("statistics not collected, load with stats=True")
+        return self.collector.report()
 
     def __getitem__(self, key):
-        # Create cache if not existing
-        if key not in self._field_cache:
-            # Load from file
-            value = []
-            for path in self.paths:
-                with h5py.File(path, "r") as h5f:
-                    value += [h5f["/".join(key)][()]]
-            value = np.concatenate(value)
-            # Determine unit
-            _, field = key
-            if field in self.spec.field_units:
-                # Use spec unit if defined
-                unit = self.spec.field_units[field]
-            else:
-                # Assume dimentionless otherwise
-                unit = "dimensionless"
-            # Create cache
-            self._field_cache[key] = self.array(value, unit)
-        # Retrieve cache
-        return self._field_cache[key]
+        if self.lazy:
+            # Build the task graph, read on compute
+            with span(self.collector, "graph", key):
+                value = lazy_module.field(self, key[:2])
+                if len(key) > 2:
+                    value = value[:, self._column(key)]
+                return self.array(value, self._field_unit(key[1]))
+        with span(self.collector, "getitem", key) as stage:
+            # Retrieve cache
+            value = self._cached(key)
+            stage.hit = value is not None
+            if value is None:
+                # Create cache if not existing
+                value = self._field_cache[key] = self.read(key)
+        return value
 
     def __delitem__(self, key):
         # Delete cache
         del self._field_cache[key]
 
+    def _cached(self, key):
+        """Cached field, or a column view of the cached full field."""
+        # Count one hit or miss per lookup, whichever entry serves it
+        value = self._field_cache.peek(key)
+        if value is None and len(key) > 2:
+            value = self._field_cache.peek(key[:2])
+            if value is not None:
+                value = value[:, self._column(key)]
+        self._field_cache.record(value is not None)
+        return value
+
+    def _column(self, key):
+        """Validated column index of a (ptype, field, column) key."""
+        shape = self.catalog.fields[key[:2]].shape
+        column = key[2]
+        if len(shape) != 2 or not 0 <= column < shape[1]:
+            raise KeyError(key)
+        return column
+
+    def read(self, key, mask=None):
+        """Read a field from file, bypassing the cache.
+
+        Parameters
+        ----------
+        key : tuple
+            The (ptype, field) key, or (ptype, field, column) key to read
+            one column of a multi-component field.
+        mask : numpy.ndarray or gizio.mask.Mask, optional
+            Mask over particles of the ptype. If given, only the selected
+            rows are read. (default: read all rows)
+
+        Returns
+        -------
+        unyt.array.unyt_array
+            The field.
+
+        """
+        field = key[1]
+        with span(self.collector, "read", key) as stage:
+            value = self._read_field(key, mask)
+            # Mapped pages are loaded on access, not read here
+            stage.nbytes = _nbytes(value)
+        with span(self.collector, "units", key):
+            # Wrap the buffer without copying
+            return self.array(value, self._field_unit(field))
+
+    def iter_chunks(self, ptype, fields, chunk_size=1 << 20, mask=None):
+        """Iterate over aligned chunks of several fields.
+
+        Rows are streamed file by file, so memory is bounded by the chunk
+        size. Cached fields are sliced from the cache instead of read.
+
+        Parameters
+        ----------
+        ptype : str
+            The particle type.
+        fields : list
+            Raw field names, or (field, column) pairs for single columns of
+            multi-component fields.
+        chunk_size : int, optional
+            Maximum number of rows per chunk. (default: 1048576)
+        mask : numpy.ndarray or gizio.mask.Mask, optional
+            Mask over particles of the ptype. If given, only selected rows
+            are yielded. (default: all rows)
+
+        Yields
+        ------
+        dict
+            A dictionary mapping fields as given to unyt arrays of equal
+            length.
+
+        """
+        keys = [
+            (ptype,) + (field if isinstance(field, tuple) else (field,))
+            for field in fields
+        ]
+        names = ["/".join(key[:2]) for key in keys]
+        units = [self._field_unit(key[1]) for key in keys]
+        if mask is not None and not isinstance(mask, Mask):
+            mask = Mask.from_bool(mask)
+        offset = 0
+        for index, shape in enumerate(self.file_shapes):
+            count = int(shape[ptype])
+            for start in range(0, count, chunk_size):
+                stop = min(start + chunk_size, count)
+                rows = np.s_[offset + start : offset + stop]
+                if mask is None or mask.kind == "full":
+                    block = None
+                elif mask.count_between(offset + start, offset + stop) == 0:
+                    continue
+                else:
+                    block = mask.block(offset + start, offset + stop)
+                chunk = {}
+                with self.files.get(index) as h5f:
+                    for field, key, name, unit in zip(
+                        fields, keys, names, units
+                    ):
+                        value = self._cached(key)
+                        if value is not None:
+                            value = value.d[rows]
+                        else:
+                            dset = h5f[name]
+                            source = slice(start, stop)
+                            tail = dset.shape[1:]
+                            if len(key) > 2:
+                                source = (source, self._column(key))
+                                tail = tail[1:]
+                            value = np.empty(
+                                (stop - start,) + tail, self._dtype(key)
+                            )
+                            dset.read_direct(value, source_sel=source)
+                        if block is not None:
+                            value = value[block]
+                        chunk[field] = self.array(value, unit)
+                yield chunk
+            offset += count
+
+    def _field_unit(self, field):
+        if field in self.spec.field_units:
+            # Use spec unit if defined
+            return self.spec.field_units[field]
+        # Assume dimentionless otherwise
+        return "dimensionless"
+
+    def field_dtype(self, field, dtype):
+        """Data type of a field under the dtype policies.
+
+        Policies are looked up in ``field_dtypes``, then ``dtype``, then the
+        spec ``DTYPE_SPEC`` and ``DTYPE_POLICY``.
+
+        Parameters
+        ----------
+        field : str
+            Raw field name or derived field key.
+        dtype : numpy.dtype
+            The native data type.
+
+        Returns
+        -------
+        numpy.dtype
+            The data type fields are served in.
+
+        """
+        if field in self.field_dtypes:
+            policy = self.field_dtypes[field]
+        elif self.dtype is not None:
+            policy = self.dtype
+        else:
+            policy = self.spec.DTYPE_SPEC.get(field, self.spec.DTYPE_POLICY)
+        return resolve_dtype(policy, dtype)
+
+    def mappable(self, key):
+        """Test whether a field is memory-mapped as a zero-copy view.
+
+        Parameters
+        ----------
+        key : tuple
+            The (ptype, field) key.
+
+        Returns
+        -------
+        bool
+            True if memory mapping is enabled and the field is stored
+            contiguously and uncompressed by a single file, in the data type
+            it is served in.
+
+        """
+        extents = self._extents(key)
+        return (
+            extents is not None
+            and len(extents) == 1
+            and self._dtype(key) == self.catalog.fields[key[:2]].dtype
+        )
+
+    def _dtype(self, key):
+        """Data type a snapshot field is served in."""
+        return self.field_dtype(key[1], self.catalog.fields[key[:2]].dtype)
+
+    def _extents(self, key):
+        """Byte offsets of a mappable field in each file holding rows."""
+        info = self.catalog.fields[key[:2]]
+        if not self.mmap or info.chunks is not None or info.compression:
+            return None
+        extents = {}
+        for index, (count, offset) in enumerate(
+            zip(info.counts, info.offsets)
+        ):
+            if count > 0:
+                if offset is None:
+                    return None
+                extents[index] = offset
+        return extents
+
+    def _map_file(self, key, index, offset):
+        info = self.catalog.fields[key[:2]]
+        value = np.memmap(
+            self.paths[index],
+            dtype=info.dtype,
+            mode="c",
+            offset=offset,
+            shape=(info.counts[index],) + info.shape[1:],
+        )
+        if len(key) > 2:
+            # Strided view of the column
+            return value[:, self._column(key)]
+        return value
+
+    def _read_field(self, key, mask):
+        ptype = key[0]
+        name = "/".join(key[:2])
+        counts = [int(shape[ptype]) for shape in self.file_shapes]
+        info = self.catalog.fields[key[:2]]
+        tail = info.shape[1:]
+        column = None
+        if len(key) > 2:
+            column = self._column(key)
+            tail = tail[1:]
+        dtype = self._dtype(key)
+
+        if mask is not None and not isinstance(mask, Mask):
+            mask = Mask.from_bool(mask)
+        extents = self._extents(key)
+        if mask is None and self.mappable(key):
+            # Zero-copy view of the only file holding rows
+            ((index, offset),) = extents.items()
+            return self._map_file(key, index, offset)
+
+        # Plan each file's slice of a single preallocated buffer
+        n_out = sum(counts) if mask is None else mask.count
+        value = np.empty((n_out,) + tail, dtype=dtype)
+        tasks = {}
+        start = 0
+        left = 0
+        for index, count in enumerate(counts):
+            if mask is None:
+                n_sel = count
+            else:
+                n_sel = mask.count_between(start, start + count)
+            if n_sel > 0:
+                tasks[index] = (start, value[left : left + n_sel])
+            start += count
+            left += n_sel
+
+        if extents:
+            # Copy from mapped files, touching only pages of selected rows
+            for index, (start, out) in tasks.items():
+                rows = self._map_file(key, index, extents[index])
+                if len(out) == len(rows):
+                    out[...] = rows
+                else:
+                    out[...] = rows[mask.block(start, start + len(rows))]
+            return value
+
+        # Fill the slices, possibly concurrently
+        def fill(index, h5f):
+            offset, out = tasks[index]
+            if len(out) == len(h5f[name]):
+                if column is None:
+                    h5f[name].read_direct(out)
+                else:
+                    h5f[name].read_direct(out, source_sel=np.s_[:, column])
+            else:
+                _read_rows(h5f[name], mask, offset, out, column)
+
+        self.files.map(fill, tasks)
+        return value
+
+    def export_cache(self, path, chunk_size=1 << 20):
+        """Export to a single-file columnar cache.
+
+        See :func:`gizio.columnar.export_cache`.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            Cache directory, written to ``<stem>.gizio.hdf5`` there, or
+            cache file path if it has a suffix.
+        chunk_size : int, optional
+            Maximum number of rows copied at a time. (default: 1048576)
+
+        Returns
+        -------
+        pathlib.Path
+            The cache file path, loaded by :func:`gizio.load_cache`.
+
+        """
+        return export_cache(self, path, chunk_size)
+
+    # file handles
+
+    def close(self):
+        """Close pooled file handles. Files are reopened on demand."""
+        self.files.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # spatial index
+
+    def spatial_index(self, ptype):
+        """Get the spatial index of a particle type, building it on first use.
+
+        Positions are wrapped by the header box size if it is positive.
+
+        Parameters
+        ----------
+        ptype : str
+            The particle type.
+
+        Returns
+        -------
+        gizio.spatial.SpatialIndex
+            The spatial index in code_length.
+
+        """
+        if ptype not in self._spatial_indices:
+            key = (ptype, self.spec.POSITION_FIELD)
+            positions = self.read(key) if self.lazy else self[key]
+            box_size = self.header[self.spec.HEADER_BOX_SIZE]
+            self._spatial_indices[ptype] = SpatialIndex(
+                positions.to_value("code_length"),
+                box_size.to_value("code_length"),
+            )
+        return self._spatial_indices[ptype]
+
+    def id_index(self, ptype):
+        """Get the particle ID index of a particle type, built on first use.
+
+        Parameters
+        ----------
+        ptype : str
+            The particle type.
+
+        Returns
+        -------
+        gizio.ids.IDIndex
+            The ID index over rows of the particle type.
+
+        """
+        if ptype not in self._id_indices:
+            path = Path(self.prefix + "." + ptype + ".ids.npz")
+            index = None
+            if self.id_sidecar:
+                index = IDIndex.load(path, self.paths)
+            if index is None:
+                # Read without caching, the index keeps sorted IDs
+                index = IDIndex(self.read((ptype, self.spec.ID_FIELD)).d)
+                if self.id_sidecar:
+                    index.save(path, self.paths)
+            self._id_indices[ptype] = index
+        return self._id_indices[ptype]
+
+    def _to_code_length(self, value):
+        return self._to_code(value, "code_length")
+
+    def _to_code(self, value, unit):
+        if isinstance(value, unyt.unyt_array):
+            unit = unyt.Unit(unit, registry=self.unit_registry)
+            return value.to_value(unit)
+        return np.asarray(value, dtype=float)
+
+    # cosmology
+
+    def cosmic_time(self, a, exact=False):
+        """Convert scale factors to cosmic time.
+
+        Parameters
+        ----------
+        a : array_like
+            Scale factors.
+        exact : bool, optional
+            Integrate with the cosmology calculator instead of interpolating
+            the cached age table. (default: False)
+
+        Returns
+        -------
+        unyt.array.unyt_array
+            Cosmic time.
+
+        """
+        table = age_table(self.cosmology)
+        func = table.exact if exact else table
+        if lazy_module.is_lazy(a):
+            t = a.map_blocks(func, dtype=np.float64)
+        else:
+            t = func(a)
+        return self.array(t, "Gyr")
+
     # unyt helpers
 
     def array(self, value, unit):
@@ -180,6 +879,8 @@ class Snapshot:
             A unyt array.
 
         """
+        if lazy_module.is_lazy(value):
+            return lazy_module.array(value, unit, self.unit_registry)
         return unyt.unyt_array(value, unit, registry=self.unit_registry)
 
     def quantity(self, value, unit):
@@ -201,6 +902,71 @@ class Snapshot:
         return unyt.unyt_quantity(value, unit, registry=self.unit_registry)
 
 
+def _rebuild_snapshot(paths, spec, options):
+    """Unpickle a snapshot, reopening files on access."""
+    return Snapshot(paths, spec, **options)
+
+
+def _rebuild_selector(snap, masks, registry, frame):
+    """Unpickle a particle selector."""
+    ps = ParticleSelector(snap, masks)
+    ps._field_registry = dict(registry)
+    ps._frame = frame
+    return ps
+
+
+class DirectField:
+    """Picklable loader of a direct field of selected particles.
+
+    .. describe:: loader(ps)
+
+        Load the field of the particles selected by a particle selector.
+
+    Parameters
+    ----------
+    field : str or tuple
+        The raw field name, or a (field, column) pair for one column of a
+        multi-component field.
+
+    Attributes
+    ----------
+    field : str or tuple
+        The raw field name, or a (field, column) pair.
+
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def __call__(self, ps):
+        snap = ps.snap
+        field = self.field if isinstance(self.field, tuple) else (self.field,)
+        with span(snap.collector, "direct", self.field):
+            data = []
+            for ptype, mask in ps.masks.items():
+                if mask is not None:
+                    key = (ptype,) + field
+                    cached_keys = snap.cached_keys()
+                    if mask.kind == "full" and snap.mappable(key):
+                        # Private mapping, sharing no memory with the cache
+                        data += [snap.read(key)]
+                    elif (
+                        snap.lazy
+                        or key in cached_keys
+                        or key[:2] in cached_keys
+                        or mask.density >= snap.partial_read_density
+                    ):
+                        # Dense selection, mask the cached full field
+                        data += [mask.take(snap[key])]
+                    else:
+                        # Sparse selection, read only the selected rows
+                        data += [snap.read(key, mask)]
+        with span(snap.collector, "concatenate", self.field):
+            if snap.lazy:
+                return lazy_module.concatenate(data)
+            return unyt.array.uconcatenate(data)
+
+
 class ParticleSelector:
     """High level snapshot field access for selected particles.
 
@@ -220,6 +986,9 @@ class ParticleSelector:
     ----------
     snap : Snapshot
         The snapshot to access.
+    masks : list
+        Per-ptype masks in the specification ptypes order, each a boolean
+        array, a :class:`gizio.mask.Mask` or None if nothing is selected.
 
     Attributes
     ----------
@@ -229,20 +998,38 @@ class ParticleSelector:
     """
 
     @property
-    def pmask(self):
-        """collections.OrderedDict: Particle mask."""
+    def masks(self):
+        """collections.OrderedDict: Compact particle mask."""
         return OrderedDict(zip(self.snap.spec.ptypes, self._masks))
 
     @property
-    def shape(self):
-        """collections.OrderedDict: Shape."""
+    def pmask(self):
+        """collections.OrderedDict: Particle mask as boolean arrays.
+
+        The arrays are materialized from the compact masks on each access.
+
+        """
         return OrderedDict(
-            [
-                (ptype, mask.sum()) if mask is not None else (ptype, 0)
-                for ptype, mask in self.pmask.items()
-            ]
+            (ptype, mask if mask is None else mask.to_bool())
+            for ptype, mask in self.masks.items()
         )
 
+    @property
+    def shape(self):
+        """collections.OrderedDict: Shape."""
+        return OrderedDict(zip(self.snap.spec.ptypes, self._counts))
+
+    @property
+    def offsets(self):
+        """collections.OrderedDict: Row ranges of particle types in fields.
+
+        Composed of {ptype_name: (start, stop)} entries.
+
+        """
+        stops = np.cumsum(self._counts).tolist()
+        starts = [0] + stops[:-1]
+        return OrderedDict(zip(self.snap.spec.ptypes, zip(starts, stops)))
+
     @classmethod
     def from_ptypes(cls, snap, ptypes):
         """Create particle selector for specified particle types.
@@ -260,12 +1047,10 @@ class ParticleSelector:
             The corresponding particle selector.
 
         """
-        spec_ptypes = deepcopy(snap.spec.ptypes)
         masks = []
-        for ptype in spec_ptypes:
+        for ptype in snap.spec.ptypes:
             if ptype in ptypes:
-                n_part = snap.shape[ptype]
-                mask = np.ones(n_part, dtype=bool)
+                mask = Mask.full(snap.shape[ptype])
             else:
                 mask = None
             masks.append(mask)
@@ -277,19 +1062,35 @@ class ParticleSelector:
         self._masks = masks
         self.normalize_mask()
         self._field_registry = {}
-        self._field_cache = {}
+        self._field_cache = FieldCache(snap._cache_budget, "selector")
+        self._frame = None
+        # Sources of cached fields inherited on first access
+        self._sources = []
+        self._source_masks = []
+        self._source_rows = None
+        self._inheritable = {}
+        self._pending = set()
 
         # Register direct fields
         for key, field in self.direct_fields().items():
             self.register_direct_field(key, field)
 
     def __copy__(self):
-        ps = ParticleSelector(self.snap, deepcopy(self._masks))
+        # Masks are immutable and can be shared
+        ps = ParticleSelector(self.snap, list(self._masks))
         ps._field_registry = deepcopy(self._field_registry)
+        ps._frame = self._frame
         return ps
 
+    def __reduce__(self):
+        # Send compact masks and field registry, not cached fields
+        return (
+            _rebuild_selector,
+            (self.snap, list(self._masks), self._field_registry, self._frame),
+        )
+
     def __len__(self):
-        return sum(self.shape.values())
+        return sum(self._counts)
 
     # field system
 
@@ -310,12 +1111,15 @@ class ParticleSelector:
         Returns
         -------
         dict
-            A dictionary mapping shorhand keys to raw field names.
+            A dictionary mapping shorhand keys to raw field names, or to
+            (field, column) pairs for the spec components of multi-component
+            fields.
 
         """
         ptype_fields = {}
+        masks = self.masks
         for ptype, field in self.snap.keys():
-            if self.pmask[ptype] is not None:
+            if masks[ptype] is not None:
                 if ptype not in ptype_fields:
                     ptype_fields[ptype] = {field}
                 else:
@@ -329,9 +1133,198 @@ class ParticleSelector:
             else:
                 key = field
             direct_fields[key] = field
+        for key, (field, column) in self.snap.spec.field_components.items():
+            if field not in common_fields:
+                continue
+            shapes = [
+                self.snap.catalog.fields[ptype, field].shape
+                for ptype in ptype_fields
+            ]
+            if all(len(shape) == 2 and column < shape[1] for shape in shapes):
+                direct_fields[key] = (field, column)
         return direct_fields
 
-    def register_field(self, key, func):
+    def iter_subsets(self, chunk_size=1 << 20):
+        """Iterate over selectors of consecutive chunks of particles.
+
+        Chunks follow the file layout, one particle type and at most
+        chunk_size rows of a file at a time, so fields of each subset are
+        read with a single hyperslab per file. Subsets share the field
+        registry and inherit cached fields.
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            Maximum number of file rows per chunk. (default: 1048576)
+
+        Yields
+        ------
+        ParticleSelector
+            A non-empty subset of the selected particles.
+
+        """
+        for index, mask in enumerate(self._masks):
+            if mask is None:
+                continue
+            ptype = self.snap.spec.ptypes[index]
+            offset = 0
+            for shape in self.snap.file_shapes:
+                count = int(shape[ptype])
+                for start in range(offset, offset + count, chunk_size):
+                    stop = min(start + chunk_size, offset + count)
+                    if mask.count_between(start, stop) == 0:
+                        continue
+                    ps = copy(self)
+                    ps._masks = [None] * len(self._masks)
+                    ps._masks[index] = mask.restrict(start, stop)
+                    ps.normalize_mask()
+                    # Consecutive rows of the parent fields
+                    first = self.offsets[ptype][0]
+                    first += mask.count_between(0, start)
+                    rows = np.arange(first, first + len(ps))
+                    ps._inherit_cache([self], rows)
+                    yield ps
+                offset += count
+
+    def iter_chunks(self, fields, chunk_size=1 << 20):
+        """Iterate over aligned chunks of selected fields.
+
+        Direct fields are streamed without creating subsets. Other fields
+        are evaluated on each subset from :meth:`iter_subsets`, so they
+        must be computed row by row.
+
+        Parameters
+        ----------
+        fields : list
+            Keys of registered fields.
+        chunk_size : int, optional
+            Maximum number of rows read per chunk. (default: 1048576)
+
+        Yields
+        ------
+        dict
+            A dictionary mapping keys to unyt arrays of equal length, one
+            particle type at a time.
+
+        """
+        direct_fields = self.direct_fields()
+        if not all(key in direct_fields for key in fields):
+            for ps in self.iter_subsets(chunk_size):
+                yield {key: ps[key] for key in fields}
+            return
+        raw_fields = [direct_fields[key] for key in fields]
+        for ptype, mask in self.masks.items():
+            if mask is not None:
+                for chunk in self.snap.iter_chunks(
+                    ptype, raw_fields, chunk_size, mask
+                ):
+                    yield {
+                        key: chunk[field]
+                        for key, field in zip(fields, raw_fields)
+                    }
+
+    def reduce(self, ops, chunk_size=1 << 20):
+        """Compute statistics of fields out of core.
+
+        See :func:`gizio.analysis.reduce`.
+
+        Parameters
+        ----------
+        ops : dict
+            Statistics to compute, e.g. ``{"m": "sum", ("t", "m"): "wmean"}``.
+        chunk_size : int, optional
+            Maximum number of file rows per chunk. (default: 1048576)
+
+        Returns
+        -------
+        dict
+            Results keyed like ops.
+
+        """
+        return analysis.reduce(self, ops, chunk_size)
+
+    def histogram(
+        self,
+        fields,
+        bins=64,
+        bounds=None,
+        log=False,
+        weights=(),
+        chunk_size=1 << 20,
+    ):
+        """Compute a weighted N-dimensional histogram out of core.
+
+        See :func:`gizio.analysis.histogram`.
+
+        Parameters
+        ----------
+        fields : list
+            Keys of the binned fields, e.g. ``["rho", "t"]``.
+        bins : int or array_like or list, optional
+            Number of bins or bin edges. (default: 64)
+        bounds : list, optional
+            Per-field (lo, hi) limits. (default: scanned)
+        log : bool or list, optional
+            Whether bins are spaced logarithmically. (default: False)
+        weights : list, optional
+            Weights summed in each bin. (default: counts only)
+        chunk_size : int, optional
+            Maximum number of file rows per chunk. (default: 1048576)
+
+        Returns
+        -------
+        gizio.analysis.Histogram
+            The histogram.
+
+        """
+        return analysis.histogram(
+            self, fields, bins, bounds, log, weights, chunk_size
+        )
+
+    def profile(
+        self,
+        field,
+        fields,
+        weight=None,
+        bins=64,
+        bounds=None,
+        log=False,
+        chunk_size=1 << 20,
+    ):
+        """Compute binned means of fields along a field out of core.
+
+        See :func:`gizio.analysis.profile`.
+
+        Parameters
+        ----------
+        field : str
+            Key of the binned field.
+        fields : list
+            Keys of the averaged fields.
+        weight : str, optional
+            Key of the weight field. (default: unweighted)
+        bins : int or array_like, optional
+            Number of bins or bin edges. (default: 64)
+        bounds : tuple, optional
+            (lo, hi) limits. (default: scanned)
+        log : bool, optional
+            Whether bins are spaced logarithmically. (default: False)
+        chunk_size : int, optional
+            Maximum number of file rows per chunk. (default: 1048576)
+
+        Returns
+        -------
+        edges : unyt.array.unyt_array
+            Bin edges.
+        means : dict
+            Mean of each field in each bin.
+
+        """
+        return analysis.profile(
+            self, field, fields, weight, bins, bounds, log, chunk_size
+        )
+
+    def register_field(self, key, func, inputs=None, unit=None):
         """Register a field.
 
         Parameters
@@ -339,10 +1332,20 @@ class ParticleSelector:
         key : str
             The key to retrieve the field.
         func : typing.Callable
-            The function to compute the field.
+            The function to compute the field from the particle selector.
+            If inputs are given, instead a row-wise function of raw input
+            arrays evaluated by a :class:`gizio.kernel.FieldKernel`.
+        inputs : list, optional
+            Input ``(key, unit)`` pairs of the kernel. (default: None)
+        unit : str, optional
+            Output unit of the kernel. (default: None)
 
         """
+        if inputs is not None:
+            func = FieldKernel(func, inputs, unit)
         self._field_registry[key] = func
+        self._inheritable.pop(key, None)
+        self._settle(key)
 
     def register_direct_field(self, key, field):
         """Register a direct field.
@@ -351,19 +1354,12 @@ class ParticleSelector:
         ----------
         key : str
             The key to retrieve the field.
-        field : str
-            The raw field name.
+        field : str or tuple
+            The raw field name, or a (field, column) pair for one column of a
+            multi-component field.
 
         """
-
-        def load_direct_field(ps):
-            data = []
-            for ptype, mask in ps.pmask.items():
-                if mask is not None:
-                    data += [ps.snap[ptype, field][mask]]
-            return unyt.array.uconcatenate(data)
-
-        self.register_field(key, load_direct_field)
+        self.register_field(key, DirectField(field))
 
     def unregister_field(self, key):
         """Unregister a field.
@@ -375,24 +1371,45 @@ class ParticleSelector:
 
         """
         del self._field_registry[key]
+        self._inheritable.pop(key, None)
+        self._settle(key)
         del self[key]
 
     def clear_cache(self):
         """Clear all field caches."""
-        self._field_cache = {}
+        self._field_cache.clear()
 
     def __contains__(self, key):
         return key in self._field_registry
 
     def __getitem__(self, key):
+        if lazy_module.is_lazy(key) and key.dtype == bool:
+            # Evaluate lazy conditions into a compact mask
+            key = np.asarray(lazy_module.raw(key).compute())
         if isinstance(key, np.ndarray) and key.dtype == bool:
             # Boolean masking
             return self._where(key)
         if isinstance(key, str):
             # Field access
-            if key not in self._field_cache:
-                self._field_cache[key] = self._field_registry[key](self)
-            return self._field_cache[key]
+            collector = self.snap.collector
+            with span(collector, "field", key) as stage:
+                value = self._field_cache.get(key)
+                stage.hit = value is not None
+                if value is None:
+                    value = self._inherited(key)
+                if value is None:
+                    func = self._field_registry[key]
+                    if isinstance(func, DirectField):
+                        value = func(self)
+                    else:
+                        with span(collector, "derived", key):
+                            value = func(self)
+                        # Promote or demote only if a policy asks for it
+                        dtype = self.snap.field_dtype(key, value.dtype)
+                        if dtype != value.dtype:
+                            value = value.astype(dtype)
+                    self._field_cache[key] = value
+            return value
         raise KeyError
 
     def __delitem__(self, key):
@@ -402,30 +1419,231 @@ class ParticleSelector:
     # mask operation
 
     def normalize_mask(self):
-        """Normalize mask arrays."""
-        # Consistently substitute all-false arrays by None
-        self._masks = [
-            mask if mask is not None and mask.any() else None
-            for mask in self._masks
-        ]
+        """Normalize masks to compact form, with None for empty ones."""
+        masks = []
+        for mask in self._masks:
+            if mask is not None and not isinstance(mask, Mask):
+                mask = Mask.from_bool(mask)
+            # Consistently substitute empty masks by None
+            masks.append(mask if mask is not None and mask.count else None)
+        self._masks = masks
+        # Cache counts
+        self._counts = [0 if mask is None else mask.count for mask in masks]
+
+    def _inherit_cache(self, sources, rows=None):
+        """Inherit cached fields of source selectors on first access.
+
+        Each selected particle must be selected by one of the sources. A
+        field is inherited if it is cached by the sources when first
+        accessed, by gathering the rows of the selected particles, so no I/O
+        or computation is redone. Only fields registered by the same
+        functions as at selection are inherited.
+
+        Sources inheriting fields themselves are replaced by their own
+        sources, with composed rows, so fields are only gathered from
+        selectors without sources. These are released once every field was
+        accessed or unregistered, and ignored once their masks change.
+
+        Parameters
+        ----------
+        sources : list
+            Source particle selectors, in order of precedence.
+        rows : numpy.ndarray, optional
+            Rows of the selected particles in fields of a single source.
+            (default: found from masks when needed)
+
+        """
+        roots = []
+        if all(not source._sources for source in sources):
+            # Gather from the sources, rows are found on first access
+            roots = list(sources)
+            contracts = [
+                {key: [func] for key, func in source._field_registry.items()}
+                for source in sources
+            ]
+            source_rows = None if rows is None else (None, rows)
+        else:
+            origins, rows = self._find_rows(sources, rows)
+            root_origins = np.empty(len(self), dtype=np.int64)
+            root_rows = np.empty(len(self), dtype=np.int64)
+            contracts = []
+            for i, source in enumerate(sources):
+                hit = slice(None) if origins is None else origins == i
+                if source._sources:
+                    # Compose with the rows of its sources
+                    index = []
+                    for root in source._sources:
+                        if root not in roots:
+                            roots += [root]
+                        index += [roots.index(root)]
+                    sub_origins, sub_rows = source._inherit_rows()
+                    sub_hit = rows[hit]
+                    if sub_origins is None:
+                        root_origins[hit] = index[0]
+                    else:
+                        root_origins[hit] = np.array(index)[
+                            sub_origins[sub_hit]
+                        ]
+                    root_rows[hit] = sub_rows[sub_hit]
+                    contracts += [source._inheritable]
+                else:
+                    if source not in roots:
+                        roots += [source]
+                    root_origins[hit] = roots.index(source)
+                    root_rows[hit] = rows[hit]
+                    contracts += [
+                        {
+                            key: [func]
+                            for key, func in source._field_registry.items()
+                        }
+                    ]
+            if len(roots) == 1:
+                root_origins = None
+            source_rows = root_origins, root_rows
+
+        # Functions of inheritable fields registered by each root
+        inheritable = {}
+        for key in self.keys():
+            if not all(key in contract for contract in contracts):
+                continue
+            funcs = [None] * len(roots)
+            for source, contract in zip(sources, contracts):
+                source_roots = source._sources or [source]
+                for root, func in zip(source_roots, contract[key]):
+                    funcs[roots.index(root)] = func
+            inheritable[key] = funcs
+        self._sources = roots
+        self._source_masks = [root._masks for root in roots]
+        self._source_rows = source_rows
+        self._inheritable = inheritable
+        self._pending = set(inheritable)
+        self._settle()
+
+    def _find_rows(self, sources, rows=None):
+        """Source and row in its fields of each selected particle."""
+        if len(sources) == 1 and rows is not None:
+            return None, rows
+        origins = None
+        if len(sources) > 1:
+            origins = np.empty(len(self), dtype=np.int64)
+        rows = np.empty(len(self), dtype=np.int64)
+        source_offsets = [source.offsets for source in sources]
+        for ptype, mask, (start, stop) in zip(
+            self.snap.spec.ptypes, self._masks, self.offsets.values()
+        ):
+            if mask is None:
+                continue
+            indices = mask.indices()
+            todo = np.ones(len(indices), dtype=bool)
+            for i, source in enumerate(sources):
+                source_mask = source.masks[ptype]
+                if source_mask is None:
+                    continue
+                hit = todo & source_mask.contains(indices)
+                first, _ = source_offsets[i][ptype]
+                if origins is not None:
+                    origins[start:stop][hit] = i
+                rows[start:stop][hit] = first + source_mask.rank(indices[hit])
+                todo &= ~hit
+            assert not todo.any()
+        return origins, rows
+
+    def _inherit_rows(self):
+        """Source and row in its fields of each selected particle."""
+        if self._source_rows is None:
+            self._source_rows = self._find_rows(self._sources)
+        return self._source_rows
+
+    def _settle(self, key=None):
+        """Mark a field as accessed, and release sources if none is left."""
+        self._pending.discard(key)
+        if not self._pending:
+            self._sources = []
+            self._source_masks = []
+            self._source_rows = None
+            self._inheritable = {}
+
+    def _inherited(self, key):
+        """Gather a field cached by the sources, or None if unavailable."""
+        funcs = self._inheritable.get(key)
+        if funcs is None:
+            return None
+        try:
+            return self._gather(key, funcs)
+        finally:
+            self._settle(key)
+
+    def _gather(self, key, funcs):
+        values = []
+        for source, masks, func in zip(
+            self._sources, self._source_masks, funcs
+        ):
+            if (
+                source._masks is not masks
+                or source._field_registry.get(key) is not func
+            ):
+                # The selection or the field changed meanwhile
+                return None
+            value = source._field_cache.peek(key)
+            if not (
+                isinstance(value, np.ndarray)
+                and value.shape[:1] == (len(source),)
+            ):
+                # Not cached, or not a per-particle field
+                return None
+            values += [value]
+        if len({hasattr(value, "units") for value in values}) > 1:
+            # Mixed unit-aware and plain values
+            return None
+
+        origins, rows = self._inherit_rows()
+        if len(values) == 1:
+            out = values[0][rows]
+        else:
+            out = np.empty(
+                (len(self),) + values[0].shape[1:],
+                dtype=np.result_type(*values),
+            )
+            units = getattr(values[0], "units", None)
+            for i, source_value in enumerate(values):
+                if units is not None:
+                    source_value = source_value.to_value(units)
+                hit = origins == i
+                out[hit] = np.asarray(source_value)[rows[hit]]
+            if units is not None:
+                out = self.snap.array(out, units)
+        self._field_cache[key] = out
+        return out
 
     def _where(self, cond):
         assert len(cond) == len(self)
         # Create new ParticleMask
         ps = copy(self)
-        left = 0
-        for mask in ps._masks:
-            if mask is not None:
-                # Update one mask array
-                n_part = mask.sum()
-                mask[mask] = cond[left : left + n_part]
-                left += n_part
+        ps._masks = [
+            mask if mask is None else mask.where(cond[start:stop])
+            for mask, (start, stop) in zip(ps._masks, self.offsets.values())
+        ]
         ps.normalize_mask()
+        ps._inherit_cache([self], np.flatnonzero(cond))
         return ps
 
-    def _update_mask(self, operator, other):
+    def _update_mask(self, operator, other, origin=None):
         # Initialize object
-        self.clear_cache()
+        if origin is None:
+            # In-place operation, keep the former state to inherit from
+            origin = copy(self)
+            origin._field_cache, self._field_cache = (
+                self._field_cache,
+                origin._field_cache,
+            )
+            origin._sources = self._sources
+            origin._source_masks = self._source_masks
+            origin._source_rows = self._source_rows
+            origin._inheritable = dict(self._inheritable)
+            origin._pending = set(self._pending)
+        if self._frame != other._frame:
+            # Fields of different frames do not combine
+            self.frame = None
         keys_to_unregister = [key for key in self.keys() if key not in other]
         for key in keys_to_unregister:
             self.unregister_field(key)
@@ -437,43 +1655,204 @@ class ParticleSelector:
             if mask1 is None and mask2 is None:
                 return None
             if mask1 is None:
-                mask1 = np.zeros_like(mask2)
+                mask1 = Mask.from_indices(mask2.n, [])
             if mask2 is None:
-                mask2 = np.zeros_like(mask1)
+                mask2 = Mask.from_indices(mask1.n, [])
             return operator(mask1, mask2)
 
-        self._masks = tuple(starmap(apply_op, zip(self._masks, other._masks)))
+        self._masks = list(starmap(apply_op, zip(self._masks, other._masks)))
         self.normalize_mask()
+        if operator in (and_, sub):
+            self._inherit_cache([origin])
+        else:
+            self._inherit_cache([origin, other])
         return self
 
+    # region selection
+
+    def _select_indices(self, query):
+        ps = copy(self)
+        masks = []
+        for ptype, mask in zip(self.snap.spec.ptypes, ps._masks):
+            if mask is not None:
+                region = Mask.from_indices(mask.n, query(ptype), True)
+                mask = region & mask
+            masks.append(mask)
+        ps._masks = masks
+        ps.normalize_mask()
+        ps._inherit_cache([self])
+        return ps
+
+    def sphere(self, center, radius):
+        """Select particles in a sphere, respecting periodic boundaries.
+
+        Parameters
+        ----------
+        center : array_like
+            Center position, in code_length unless given as unyt array.
+        radius : float or unyt.array.unyt_quantity
+            Radius, in code_length unless given as unyt quantity.
+
+        Returns
+        -------
+        ParticleSelector
+            The selected particles.
+
+        """
+        return self.shell(center, 0.0, radius)
+
+    def shell(self, center, inner, outer):
+        """Select particles in a spherical shell.
+
+        Parameters
+        ----------
+        center : array_like
+            Center position, in code_length unless given as unyt array.
+        inner : float or unyt.array.unyt_quantity
+            Inner radius, inclusive.
+        outer : float or unyt.array.unyt_quantity
+            Outer radius, exclusive.
+
+        Returns
+        -------
+        ParticleSelector
+            The selected particles.
+
+        """
+        to_code_length = self.snap._to_code_length
+        center = to_code_length(center)
+        inner = to_code_length(inner)
+        outer = to_code_length(outer)
+        return self._select_indices(
+            lambda ptype: self.snap.spatial_index(ptype).query_sphere(
+                center, outer, inner
+            )
+        )
+
+    def box(self, lo, hi):
+        """Select particles in an axis-aligned box.
+
+        Parameters
+        ----------
+        lo : array_like
+            Lower corner, inclusive.
+        hi : array_like
+            Upper corner, exclusive.
+
+        Returns
+        -------
+        ParticleSelector
+            The selected particles.
+
+        """
+        lo = self.snap._to_code_length(lo)
+        hi = self.snap._to_code_length(hi)
+        return self._select_indices(
+            lambda ptype: self.snap.spatial_index(ptype).query_box(lo, hi)
+        )
+
+    def select_ids(self, ids):
+        """Select particles by ID.
+
+        IDs are looked up in the cached ID indices of the snapshot. All
+        particles sharing a requested ID are selected.
+
+        Parameters
+        ----------
+        ids : array_like
+            Particle IDs. Absent ones are ignored.
+
+        Returns
+        -------
+        ParticleSelector
+            The selected particles.
+
+        """
+        ids = np.asarray(ids)
+        return self._select_indices(
+            lambda ptype: self.snap.id_index(ptype).rows(ids)
+        )
+
+    # reference frame
+
+    @property
+    def frame(self):
+        """gizio.frame.Frame or None: Reference frame of derived fields.
+
+        A frame registers the fields ``p_rel``, ``v_rel``, ``r``, ``v_r`` and
+        ``L``, evaluated chunk by chunk and cached like other fields.
+        Setting another frame, or None, drops them along with their cache.
+        Selections keep the frame and inherit its cached fields.
+
+        """
+        return self._frame
+
+    @frame.setter
+    def frame(self, frame):
+        for key in FRAME_FIELDS:
+            if key in self._field_registry:
+                self.unregister_field(key)
+        self._frame = frame
+        if frame is None:
+            return
+        for key, (method, inputs, unit) in FRAME_FIELDS.items():
+            if all(name in self for name, _ in inputs):
+                self.register_field(key, getattr(frame, method), inputs, unit)
+
+    def set_frame(self, center, velocity=None, rotation=None):
+        """Set the reference frame, unwrapped by the header box size.
+
+        Parameters
+        ----------
+        center : array_like
+            Center position, in code_length unless given as unyt array.
+        velocity : array_like, optional
+            Bulk velocity, in code_velocity unless given as unyt array.
+            (default: zero)
+        rotation : array_like, optional
+            Rotation matrix whose rows are the frame axes. (default:
+            identity)
+
+        """
+        snap = self.snap
+        if velocity is not None:
+            velocity = snap._to_code(velocity, "code_velocity")
+        box_size = snap.header[snap.spec.HEADER_BOX_SIZE]
+        self.frame = Frame(
+            snap._to_code_length(center),
+            velocity,
+            rotation,
+            box_size.to_value("code_length"),
+        )
+
     ## | union
 
     def __or__(self, other):
-        return copy(self).__ior__(other)
+        return copy(self)._update_mask(or_, other, self)
 
     def __ior__(self, other):
-        return self._update_mask(np.logical_or, other)
+        return self._update_mask(or_, other)
 
     ## & intersection
 
     def __and__(self, other):
-        return copy(self).__iand__(other)
+        return copy(self)._update_mask(and_, other, self)
 
     def __iand__(self, other):
-        return self._update_mask(np.logical_and, other)
+        return self._update_mask(and_, other)
 
     ## - difference
 
     def __sub__(self, other):
-        return copy(self).__isub__(other)
+        return copy(self)._update_mask(sub, other, self)
 
     def __isub__(self, other):
-        return self._update_mask(lambda a, b: a ^ (a & b), other)
+        return self._update_mask(sub, other)
 
     ## ^ symmetric difference
 
     def __xor__(self, other):
-        return copy(self).__ixor__(other)
+        return copy(self)._update_mask(xor, other, self)
 
     def __ixor__(self, other):
-        return self._update_mask(np.logical_xor, other)
+        return self._update_mask(xor, other)
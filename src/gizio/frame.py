@@ -0,0 +1,276 @@
+"""Reference frames of particle selectors."""
+import numpy as np
+import unyt
+
+from .lazy import is_lazy, raw
+
+
+# Fields derived in a frame, {key: (method, inputs, unit)}
+_P = ("p", "code_length")
+_V = ("v", "code_velocity")
+FRAME_FIELDS = {
+    "p_rel": ("relative_positions", [_P], "code_length"),
+    "v_rel": ("relative_velocities", [_V], "code_velocity"),
+    "r": ("radii", [_P], "code_length"),
+    "v_r": ("radial_velocities", [_P, _V], "code_velocity"),
+    "L": (
+        "angular_momenta",
+        [("m", "code_mass"), _P, _V],
+        "code_mass * code_length * code_velocity",
+    ),
+}
+
+
+class Frame:
+    """Reference frame with a center, bulk velocity and rotation.
+
+    Positions relative to the center are unwrapped across periodic
+    boundaries, then rotated with velocities relative to the bulk velocity.
+    Frames are immutable, so fields cached in a frame stay valid until a
+    selector is given another frame.
+
+    Parameters
+    ----------
+    center : array_like
+        Center position, in code_length.
+    velocity : array_like, optional
+        Bulk velocity, in code_velocity. (default: zero)
+    rotation : array_like, optional
+        Rotation matrix whose rows are the frame axes. (default: identity)
+    box_size : float, optional
+        Periodic box size in code_length. If not positive, positions are not
+        unwrapped. (default: 0.0)
+
+    Attributes
+    ----------
+    center : numpy.ndarray
+        Center position.
+    velocity : numpy.ndarray
+        Bulk velocity.
+    rotation : numpy.ndarray
+        Rotation matrix.
+    box_size : float
+        Periodic box size.
+
+    """
+
+    def __init__(self, center, velocity=None, rotation=None, box_size=0.0):
+        self.center = _frozen(center, (3,))
+        self.velocity = _frozen(
+            np.zeros(3) if velocity is None else velocity, (3,)
+        )
+        self.rotation = _frozen(
+            np.eye(3) if rotation is None else rotation, (3, 3)
+        )
+        self.box_size = float(box_size)
+
+    def __repr__(self):
+        return (
+            f"Frame(center={self.center.tolist()}, "
+            f"velocity={self.velocity.tolist()}, "
+            f"rotation={self.rotation.tolist()}, box_size={self.box_size})"
+        )
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Frame)
+            and np.array_equal(self.center, other.center)
+            and np.array_equal(self.velocity, other.velocity)
+            and np.array_equal(self.rotation, other.rotation)
+            and self.box_size == other.box_size
+        )
+
+    def __hash__(self):
+        return hash(self.center.tobytes())
+
+    @property
+    def rotated(self):
+        """bool: Whether the rotation is not the identity."""
+        return not np.array_equal(self.rotation, np.eye(3))
+
+    # row-wise kernels on raw arrays in code units
+
+    def _unwrapped(self, p):
+        delta = p - self.center.astype(p.dtype)
+        if self.box_size > 0:
+            box_size = p.dtype.type(self.box_size)
+            delta -= box_size * np.round(delta / box_size)
+        return delta
+
+    def relative_positions(self, p):
+        """Positions relative to the center, in frame axes."""
+        delta = self._unwrapped(p)
+        if self.rotated:
+            return delta @ self.rotation.T.astype(p.dtype)
+        return delta
+
+    def relative_velocities(self, v):
+        """Velocities relative to the bulk velocity, in frame axes."""
+        delta = v - self.velocity.astype(v.dtype)
+        if self.rotated:
+            return delta @ self.rotation.T.astype(v.dtype)
+        return delta
+
+    def radii(self, p):
+        """Distances from the center."""
+        delta = self._unwrapped(p)
+        return np.sqrt(np.einsum("ij,ij->i", delta, delta))
+
+    def radial_velocities(self, p, v):
+        """Relative velocities along the direction from the center."""
+        delta = self._unwrapped(p)
+        r = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+        v_r = np.einsum("ij,ij->i", delta, v - self.velocity.astype(v.dtype))
+        np.divide(v_r, r, out=v_r, where=r > 0)
+        return v_r
+
+    def angular_momenta(self, m, p, v):
+        """Angular momenta about the center, in frame axes."""
+        L = np.cross(self.relative_positions(p), self.relative_velocities(v))
+        L *= m[:, np.newaxis]
+        return L
+
+
+def _frozen(value, shape):
+    """Read-only float copy of a value of a given shape."""
+    value = np.array(value, dtype=float)
+    if value.shape != shape:
+        raise ValueError(f"expected shape {shape}, got {value.shape}")
+    value.flags.writeable = False
+    return value
+
+
+def _raw(ps, key):
+    """Raw values of a selector field in code units."""
+    unit = {"m": "code_mass", "p": "code_length", "v": "code_velocity"}[key]
+    value = ps[key].to(unyt.Unit(unit, registry=ps.snap.unit_registry))
+    return raw(value).compute() if is_lazy(value) else value.d
+
+
+def _weights(ps, weight):
+    return np.ones(len(ps)) if weight is None else _raw(ps, weight)
+
+
+def shrinking_sphere(
+    ps, center=None, radius=None, shrink=0.7, min_count=100, weight="m"
+):
+    """Estimate a center by iteratively shrinking spheres.
+
+    Starting from a sphere enclosing the particles, the center is moved to
+    the weighted mean position of the particles inside, and the radius is
+    reduced, until fewer than ``min_count`` particles are left. Each step
+    only visits the particles of the previous sphere.
+
+    Parameters
+    ----------
+    ps : gizio.core.ParticleSelector
+        The particles, e.g. the dark matter and stars around a halo.
+    center : array_like, optional
+        Initial center in code_length. (default: the weighted median
+        position)
+    radius : float, optional
+        Initial radius in code_length. (default: enclosing all particles)
+    shrink : float, optional
+        Radius reduction factor per step. (default: 0.7)
+    min_count : int, optional
+        Minimum number of particles in a sphere. (default: 100)
+    weight : str, optional
+        Weight field, None for equal weights. (default: "m")
+
+    Returns
+    -------
+    numpy.ndarray
+        The center in code_length.
+
+    """
+    p = _raw(ps, "p")
+    w = _weights(ps, weight)
+    box_size = ps.snap.header[ps.snap.spec.HEADER_BOX_SIZE]
+    frame = Frame(
+        np.median(p, axis=0) if center is None else center,
+        box_size=box_size.to_value("code_length"),
+    )
+    delta = frame._unwrapped(p)
+    r2 = np.einsum("ij,ij->i", delta, delta)
+    if radius is None:
+        radius = np.sqrt(r2.max()) if len(r2) else 0.0
+    center = frame.center.copy()
+    while True:
+        inside = r2 < radius ** 2
+        if inside.sum() < max(min_count, 1):
+            break
+        # Move to the weighted mean, then keep the particles inside
+        shift = np.average(delta[inside], axis=0, weights=w[inside])
+        center += shift
+        delta = delta[inside] - shift
+        w = w[inside]
+        r2 = np.einsum("ij,ij->i", delta, delta)
+        radius *= shrink
+    if frame.box_size > 0:
+        center %= frame.box_size
+    return center
+
+
+def bulk_velocity(ps, center, radius, weight="m"):
+    """Weighted mean velocity of particles in a sphere.
+
+    Parameters
+    ----------
+    ps : gizio.core.ParticleSelector
+        The particles.
+    center : array_like
+        Sphere center in code_length.
+    radius : float
+        Sphere radius in code_length.
+    weight : str, optional
+        Weight field, None for equal weights. (default: "m")
+
+    Returns
+    -------
+    numpy.ndarray
+        The velocity in code_velocity.
+
+    """
+    sphere = ps.sphere(center, radius)
+    if len(sphere) == 0:
+        return np.zeros(3)
+    return np.average(
+        _raw(sphere, "v"), axis=0, weights=_weights(sphere, weight)
+    )
+
+
+def disk_rotation(ps, center, velocity, radius):
+    """Rotation aligning the z axis with the angular momentum in a sphere.
+
+    Parameters
+    ----------
+    ps : gizio.core.ParticleSelector
+        The particles, e.g. the stars or cold gas of a galaxy.
+    center : array_like
+        Sphere center in code_length.
+    velocity : array_like
+        Bulk velocity in code_velocity.
+    radius : float
+        Sphere radius in code_length.
+
+    Returns
+    -------
+    numpy.ndarray
+        The rotation matrix whose rows are the frame axes.
+
+    """
+    sphere = ps.sphere(center, radius)
+    box_size = ps.snap.header[ps.snap.spec.HEADER_BOX_SIZE]
+    frame = Frame(center, velocity, box_size=box_size.to_value("code_length"))
+    L = frame.angular_momenta(
+        _raw(sphere, "m"), _raw(sphere, "p"), _raw(sphere, "v")
+    ).sum(axis=0)
+    norm = np.linalg.norm(L)
+    if norm == 0:
+        return np.eye(3)
+    z = L / norm
+    # Complete with the coordinate axis least aligned with z
+    x = np.cross(np.eye(3)[np.argmin(np.abs(z))], z)
+    x /= np.linalg.norm(x)
+    y = np.cross(z, x)
+    return np.array([x, y, z])
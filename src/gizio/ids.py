@@ -0,0 +1,205 @@
+"""Particle ID lookup and matching."""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .catalog import Catalog
+from .lazy import is_lazy, raw
+
+
+class IDIndex:
+    """Sorted permutation index of particle IDs.
+
+    IDs need not be unique, e.g. split particles share IDs, and a lookup
+    returns every particle with a requested ID.
+
+    .. describe:: len(index)
+
+        Return the number of indexed particles.
+
+    Parameters
+    ----------
+    ids : numpy.ndarray
+        Particle IDs, one per row.
+    order : numpy.ndarray, optional
+        Precomputed stable argsort of ids. (default: computed)
+
+    """
+
+    VERSION = 1
+
+    def __init__(self, ids, order=None):
+        ids = np.asarray(ids)
+        if order is None:
+            order = np.argsort(ids, kind="stable")
+        self._order = order
+        self._sorted = ids[order]
+
+    def __len__(self):
+        return len(self._order)
+
+    def ranges(self, ids):
+        """Ranges of sorted rows holding each ID.
+
+        Parameters
+        ----------
+        ids : array_like
+            Particle IDs to look up.
+
+        Returns
+        -------
+        start : numpy.ndarray
+            First sorted position of each ID.
+        count : numpy.ndarray
+            Number of particles with each ID, 0 if absent.
+
+        """
+        start = np.searchsorted(self._sorted, ids, side="left")
+        stop = np.searchsorted(self._sorted, ids, side="right")
+        return start, stop - start
+
+    def gather(self, start, count):
+        """Rows of sorted position ranges.
+
+        Parameters
+        ----------
+        start : numpy.ndarray
+            First sorted position of each range.
+        count : numpy.ndarray
+            Length of each range.
+
+        Returns
+        -------
+        numpy.ndarray
+            Rows of all ranges, concatenated in order.
+
+        """
+        total = int(count.sum())
+        offsets = np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+        return self._order[np.repeat(start, count) + offsets]
+
+    def rows(self, ids):
+        """Rows of all particles with any of the IDs.
+
+        Parameters
+        ----------
+        ids : array_like
+            Particle IDs to look up. Absent ones are ignored.
+
+        Returns
+        -------
+        numpy.ndarray
+            Sorted unique rows.
+
+        """
+        start, count = self.ranges(np.unique(ids))
+        return np.sort(self.gather(start, count))
+
+    # persistence
+
+    def save(self, path, paths):
+        """Save next to a snapshot, keyed by file sizes and mtimes.
+
+        Failures, e.g. on read-only file systems, are silently ignored.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            Index file path, with ``.npz`` suffix.
+        paths : list
+            Snapshot file paths.
+
+        """
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        stamp = json.dumps([self.VERSION, Catalog._stamp(paths)])
+        try:
+            np.savez(
+                tmp_path, order=self._order, ids=self._sorted, stamp=stamp
+            )
+            os.replace(tmp_path, path)
+        except OSError:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    @classmethod
+    def load(cls, path, paths):
+        """Load from a file if it matches the snapshot files.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            Index file path.
+        paths : list
+            Snapshot file paths.
+
+        Returns
+        -------
+        IDIndex or None
+            The index, or None if the file is missing or stale.
+
+        """
+        try:
+            with np.load(path) as content:
+                stamp = str(content["stamp"])
+                if stamp != json.dumps([cls.VERSION, Catalog._stamp(paths)]):
+                    return None
+                index = cls.__new__(cls)
+                index._order = content["order"]
+                index._sorted = content["ids"]
+        except (OSError, KeyError, ValueError):
+            return None
+        return index
+
+
+def match(ps_a, ps_b):
+    """Match particles of two selectors by ID.
+
+    Particles of ``ps_b`` are looked up in the cached ID indices of its
+    snapshot, so only the IDs of ``ps_a`` are read. With duplicate IDs,
+    every pair of particles sharing an ID is matched.
+
+    Parameters
+    ----------
+    ps_a : gizio.core.ParticleSelector
+        The first particle selector, e.g. of an earlier snapshot.
+    ps_b : gizio.core.ParticleSelector
+        The second particle selector.
+
+    Returns
+    -------
+    index_a : numpy.ndarray
+        Rows of matched particles in ``ps_a`` fields.
+    index_b : numpy.ndarray
+        Rows of the matching particles in ``ps_b`` fields, aligned with
+        ``index_a`` so that ``ps_a["id"][index_a] == ps_b["id"][index_b]``.
+        Pairs are sorted by ``index_a``, then ``index_b``.
+
+    """
+    snap = ps_b.snap
+    ids = ps_a[snap.spec.field_abbrs[snap.spec.ID_FIELD]]
+    ids = raw(ids).compute() if is_lazy(ids) else ids.d
+    rows_a = np.arange(len(ids))
+    index_a = []
+    index_b = []
+    for ptype, mask in ps_b.masks.items():
+        if mask is None:
+            continue
+        index = snap.id_index(ptype)
+        start, count = index.ranges(ids)
+        found_a = np.repeat(rows_a, count)
+        found_b = index.gather(start, count)
+        # Keep particles selected by ps_b, as rows of its fields
+        selected = mask.contains(found_b)
+        index_a += [found_a[selected]]
+        index_b += [
+            mask.rank(found_b[selected]) + ps_b.offsets[ptype][0]
+        ]
+    if not index_a:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    index_a = np.concatenate(index_a)
+    index_b = np.concatenate(index_b)
+    order = np.lexsort((index_b, index_a))
+    return index_a[order], index_b[order]
@@ -0,0 +1,155 @@
+"""Lazy fields backed by Dask arrays.
+
+Dask is an optional dependency, required only by lazy snapshots.
+"""
+import numpy as np
+
+try:
+    import dask.array as da
+    from dask.base import tokenize
+    from unyt.dask_array import unyt_from_dask
+except ImportError:  # pragma: no cover
+    da = None
+
+
+def _require():
+    if da is None:
+        raise ImportError("lazy snapshots require dask, e.g. dask[array]")
+
+
+def is_lazy(value):
+    """Test whether a value is a Dask array.
+
+    Parameters
+    ----------
+    value : object
+        The value.
+
+    Returns
+    -------
+    bool
+        True for Dask arrays, with or without units.
+
+    """
+    return da is not None and isinstance(value, da.Array)
+
+
+def raw(value):
+    """Strip units from an eager or lazy array.
+
+    Parameters
+    ----------
+    value : unyt.array.unyt_array or unyt.dask_array.unyt_dask_array
+        The array.
+
+    Returns
+    -------
+    numpy.ndarray or dask.array.Array
+        The array without units.
+
+    """
+    if is_lazy(value):
+        return value.to_dask() if hasattr(value, "to_dask") else value
+    return value.d
+
+
+def array(value, unit, registry):
+    """Attach units to a Dask array.
+
+    Parameters
+    ----------
+    value : dask.array.Array
+        The array.
+    unit : str or unyt.Unit
+        The unit.
+    registry : unyt.UnitRegistry
+        The unit registry.
+
+    Returns
+    -------
+    unyt.dask_array.unyt_dask_array
+        The array with units.
+
+    """
+    _require()
+    return unyt_from_dask(raw(value), unit, registry=registry)
+
+
+def concatenate(values):
+    """Concatenate lazy arrays of the same unit.
+
+    Parameters
+    ----------
+    values : list
+        Arrays with units.
+
+    Returns
+    -------
+    unyt.dask_array.unyt_dask_array
+        The concatenated array.
+
+    """
+    units = values[0].units
+    return array(
+        da.concatenate([raw(value.to(units)) for value in values]),
+        units,
+        units.registry,
+    )
+
+
+def _read_block(files, index, name, shape, dtype):
+    """Read a dataset of one file."""
+    out = np.empty(shape, dtype=dtype)
+    with files.get(index) as h5f:
+        h5f[name].read_direct(out)
+    return out
+
+
+def field(snap, key):
+    """Build a lazy field with one chunk per file.
+
+    Parameters
+    ----------
+    snap : gizio.core.Snapshot
+        The snapshot.
+    key : tuple
+        The (ptype, field) key.
+
+    Returns
+    -------
+    dask.array.Array
+        The field without units.
+
+    """
+    _require()
+    ptype, _ = key
+    info = snap.catalog.fields[key]
+    tail = info.shape[1:]
+    dtype = snap.field_dtype(key[1], info.dtype)
+    # Same files read under another dtype or unit system are another array
+    name = "gizio-" + tokenize(
+        [str(path) for path in snap.paths],
+        key,
+        np.dtype(dtype).str,
+        snap.spec.UNIT_SPEC,
+    )
+    graph = {}
+    rows = []
+    for index, shape in enumerate(snap.file_shapes):
+        count = int(shape[ptype])
+        if count == 0:
+            continue
+        block = (name, len(rows)) + (0,) * len(tail)
+        graph[block] = (
+            _read_block,
+            snap.files,
+            index,
+            "/".join(key),
+            (count,) + tail,
+            dtype,
+        )
+        rows += [count]
+    if not rows:
+        return da.empty((0,) + tail, dtype=dtype)
+    chunks = (tuple(rows),) + tuple((size,) for size in tail)
+    return da.Array(graph, name, chunks, dtype=dtype)
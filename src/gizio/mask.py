@@ -0,0 +1,499 @@
+"""Compact particle masks."""
+import numpy as np
+
+
+# Number of set bits of each byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def runs(block):
+    """Start and stop indices of contiguous runs in a boolean array.
+
+    Parameters
+    ----------
+    block : numpy.ndarray
+        A boolean array.
+
+    Returns
+    -------
+    starts : numpy.ndarray
+        Run start indices.
+    stops : numpy.ndarray
+        Run stop indices, exclusive.
+
+    """
+    edges = np.diff(block.view(np.int8), prepend=0, append=0)
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+class Mask:
+    """Immutable compact selection of particles.
+
+    A selection is stored as a flag if it is full, as a sorted index array if
+    it is sparse, and as packed bits if it is dense, whichever takes the
+    least memory. The number of selected particles is cached and set
+    operations work directly on the compact forms.
+
+    .. describe:: mask1 | mask2
+    .. describe:: mask1 & mask2
+    .. describe:: mask1 - mask2
+    .. describe:: mask1 ^ mask2
+
+        Return the union, intersection, difference or symmetric difference.
+
+    Parameters
+    ----------
+    n : int
+        Total number of particles.
+    indices : numpy.ndarray, optional
+        Sorted unique indices of selected particles.
+    bits : numpy.ndarray, optional
+        Selection packed by :func:`numpy.packbits`.
+    count : int, optional
+        Number of selected particles. (default: computed)
+
+    If neither indices nor bits are given, all particles are selected.
+    Prefer the ``from_*`` constructors, which pick the representation.
+
+    Attributes
+    ----------
+    n : int
+        Total number of particles.
+    count : int
+        Number of selected particles.
+
+    """
+
+    def __init__(self, n, indices=None, bits=None, count=None):
+        self.n = int(n)
+        self._indices = indices
+        self._bits = bits
+        if count is None:
+            if indices is not None:
+                count = len(indices)
+            elif bits is not None:
+                count = int(_POPCOUNT[bits].sum(dtype=np.int64))
+            else:
+                count = self.n
+        self.count = int(count)
+        self._prefix = None
+
+    # construction
+
+    @classmethod
+    def full(cls, n):
+        """Select all of n particles.
+
+        Parameters
+        ----------
+        n : int
+            Total number of particles.
+
+        Returns
+        -------
+        Mask
+            The mask.
+
+        """
+        return cls(n)
+
+    @classmethod
+    def from_bool(cls, array):
+        """Create a mask from a boolean array.
+
+        Parameters
+        ----------
+        array : numpy.ndarray
+            A boolean array.
+
+        Returns
+        -------
+        Mask
+            The mask.
+
+        """
+        array = np.asarray(array, dtype=bool)
+        n = len(array)
+        count = int(np.count_nonzero(array))
+        if count == n:
+            return cls(n)
+        if cls._is_sparse(n, count):
+            return cls(n, indices=np.flatnonzero(array).astype(_itype(n)))
+        return cls(n, bits=np.packbits(array), count=count)
+
+    @classmethod
+    def from_indices(cls, n, indices, assume_sorted=False):
+        """Create a mask from particle indices.
+
+        Parameters
+        ----------
+        n : int
+            Total number of particles.
+        indices : array_like
+            Indices of selected particles.
+        assume_sorted : bool, optional
+            Whether indices are known to be sorted and unique.
+            (default: False)
+
+        Returns
+        -------
+        Mask
+            The mask.
+
+        """
+        indices = np.asarray(indices)
+        if not assume_sorted:
+            indices = np.unique(indices)
+        count = len(indices)
+        if count == n:
+            return cls(n)
+        if cls._is_sparse(n, count):
+            return cls(n, indices=indices.astype(_itype(n), copy=False))
+        array = np.zeros(n, dtype=bool)
+        array[indices] = True
+        return cls(n, bits=np.packbits(array), count=count)
+
+    @classmethod
+    def _from_bits(cls, n, bits):
+        mask = cls(n, bits=bits)
+        if mask.count == n:
+            return cls(n)
+        if cls._is_sparse(n, mask.count):
+            return cls(n, indices=mask.indices())
+        return mask
+
+    @staticmethod
+    def _is_sparse(n, count):
+        # Index arrays take less memory than packed bits
+        return count * np.dtype(_itype(n)).itemsize * 8 < n
+
+    # properties
+
+    @property
+    def kind(self):
+        """str: Representation, one of "full", "index" and "bits"."""
+        if self._indices is not None:
+            return "index"
+        if self._bits is not None:
+            return "bits"
+        return "full"
+
+    @property
+    def density(self):
+        """float: Fraction of selected particles."""
+        return self.count / self.n if self.n else 0.0
+
+    @property
+    def nbytes(self):
+        """int: Memory taken by the representation."""
+        if self._indices is not None:
+            return self._indices.nbytes
+        if self._bits is not None:
+            return self._bits.nbytes
+        return 0
+
+    # conversion
+
+    def to_bool(self):
+        """Materialize as a boolean array.
+
+        Returns
+        -------
+        numpy.ndarray
+            The boolean array of length n.
+
+        """
+        if self._indices is not None:
+            array = np.zeros(self.n, dtype=bool)
+            array[self._indices] = True
+            return array
+        if self._bits is not None:
+            return np.unpackbits(self._bits, count=self.n).view(bool)
+        return np.ones(self.n, dtype=bool)
+
+    def indices(self):
+        """Sorted indices of selected particles.
+
+        Returns
+        -------
+        numpy.ndarray
+            The indices.
+
+        """
+        if self._indices is not None:
+            return self._indices
+        if self._bits is not None:
+            return np.flatnonzero(self.to_bool()).astype(_itype(self.n))
+        return np.arange(self.n, dtype=_itype(self.n))
+
+    def block(self, start, stop):
+        """Materialize a range of the selection as a boolean array.
+
+        Parameters
+        ----------
+        start : int
+            First particle of the range.
+        stop : int
+            Stop particle of the range, exclusive.
+
+        Returns
+        -------
+        numpy.ndarray
+            The boolean array of length stop - start.
+
+        """
+        if self._indices is not None:
+            array = np.zeros(stop - start, dtype=bool)
+            lo, hi = np.searchsorted(self._indices, [start, stop])
+            array[self._indices[lo:hi] - start] = True
+            return array
+        if self._bits is not None:
+            first = start // 8
+            bits = self._bits[first : (stop + 7) // 8]
+            array = np.unpackbits(bits).view(bool)
+            return array[start - 8 * first : stop - 8 * first]
+        return np.ones(stop - start, dtype=bool)
+
+    def restrict(self, start, stop):
+        """Restrict the selection to a range.
+
+        Parameters
+        ----------
+        start : int
+            First particle of the range.
+        stop : int
+            Stop particle of the range, exclusive.
+
+        Returns
+        -------
+        Mask
+            The mask of selected particles in the range.
+
+        """
+        if self._indices is not None:
+            lo, hi = np.searchsorted(self._indices, [start, stop])
+            return Mask(self.n, indices=self._indices[lo:hi])
+        count = stop - start
+        if self._is_sparse(self.n, count):
+            indices = np.arange(start, stop, dtype=_itype(self.n))
+            if self._bits is not None:
+                indices = indices[self.block(start, stop)]
+            return Mask(self.n, indices=indices)
+        array = np.zeros(self.n, dtype=bool)
+        array[start:stop] = self.block(start, stop)
+        return Mask.from_bool(array)
+
+    def count_between(self, start, stop):
+        """Number of selected particles in a range.
+
+        Parameters
+        ----------
+        start : int
+            First particle of the range.
+        stop : int
+            Stop particle of the range, exclusive.
+
+        Returns
+        -------
+        int
+            The count.
+
+        """
+        if self._indices is not None:
+            lo, hi = np.searchsorted(self._indices, [start, stop])
+            return int(hi - lo)
+        if self._bits is not None:
+            return int(np.count_nonzero(self.block(start, stop)))
+        return stop - start
+
+    def runs(self, start, stop):
+        """Contiguous runs of selected particles in a range.
+
+        Parameters
+        ----------
+        start : int
+            First particle of the range.
+        stop : int
+            Stop particle of the range, exclusive.
+
+        Returns
+        -------
+        starts : numpy.ndarray
+            Run start indices, relative to start.
+        stops : numpy.ndarray
+            Run stop indices, exclusive and relative to start.
+
+        """
+        if self._indices is not None:
+            lo, hi = np.searchsorted(self._indices, [start, stop])
+            indices = self._indices[lo:hi].astype(np.int64) - start
+            if len(indices) == 0:
+                return indices, indices
+            breaks = np.flatnonzero(np.diff(indices) != 1)
+            starts = indices[np.concatenate([[0], breaks + 1])]
+            stops = indices[np.concatenate([breaks, [len(indices) - 1]])] + 1
+            return starts, stops
+        return runs(self.block(start, stop))
+
+    def contains(self, indices):
+        """Test whether particles are selected.
+
+        Parameters
+        ----------
+        indices : numpy.ndarray
+            Particle indices.
+
+        Returns
+        -------
+        numpy.ndarray
+            A boolean array.
+
+        """
+        indices = np.asarray(indices)
+        if self._indices is not None:
+            if len(self._indices) == 0:
+                return np.zeros(len(indices), dtype=bool)
+            pos = np.searchsorted(self._indices, indices)
+            pos = np.minimum(pos, len(self._indices) - 1)
+            return self._indices[pos] == indices
+        if self._bits is not None:
+            shift = 7 - (indices & 7)
+            return ((self._bits[indices >> 3] >> shift) & 1).astype(bool)
+        return np.ones(len(indices), dtype=bool)
+
+    def rank(self, indices):
+        """Positions of selected particles within the selection.
+
+        Parameters
+        ----------
+        indices : numpy.ndarray
+            Indices of selected particles.
+
+        Returns
+        -------
+        numpy.ndarray
+            Number of selected particles preceding each index.
+
+        """
+        indices = np.asarray(indices)
+        if self._indices is not None:
+            return np.searchsorted(self._indices, indices)
+        if self._bits is not None:
+            if self._prefix is None:
+                # Cache selected counts before each byte
+                self._prefix = np.concatenate(
+                    [[0], np.cumsum(_POPCOUNT[self._bits], dtype=np.int64)]
+                )
+            byte = indices >> 3
+            # Selected bits in the same byte preceding each index
+            head = self._bits[byte].astype(np.uint16) >> (8 - (indices & 7))
+            return self._prefix[byte] + _POPCOUNT[head]
+        return indices.astype(np.int64)
+
+    def take(self, array):
+        """Take selected rows of an array.
+
+        Parameters
+        ----------
+        array : numpy.ndarray
+            An array of length n.
+
+        Returns
+        -------
+        numpy.ndarray
+            A new array of selected rows.
+
+        """
+        if self._indices is not None:
+            return array[self._indices]
+        if self._bits is not None:
+            return array[self.to_bool()]
+        return array.copy()
+
+    def where(self, cond):
+        """Subselect among selected particles.
+
+        Parameters
+        ----------
+        cond : numpy.ndarray
+            A boolean array of length count.
+
+        Returns
+        -------
+        Mask
+            The mask of selected particles satisfying cond.
+
+        """
+        cond = np.asarray(cond, dtype=bool)
+        if self._indices is not None:
+            return Mask.from_indices(
+                self.n, self._indices[cond], assume_sorted=True
+            )
+        if self._bits is not None:
+            array = self.to_bool()
+            array[array] = cond
+            return Mask.from_bool(array)
+        return Mask.from_bool(cond)
+
+    # set operations
+
+    def _packed(self):
+        if self._bits is not None:
+            return self._bits
+        if self._indices is not None:
+            return np.packbits(self.to_bool())
+        bits = np.full((self.n + 7) // 8, 0xFF, dtype=np.uint8)
+        if self.n % 8:
+            bits[-1] = (0xFF << (8 - self.n % 8)) & 0xFF
+        return bits
+
+    def _check(self, other):
+        if self.n != other.n:
+            raise ValueError("masks of different lengths")
+
+    def __or__(self, other):
+        self._check(other)
+        if self.kind == "full" or other.kind == "full":
+            return Mask(self.n)
+        if self.kind == other.kind == "index":
+            return Mask.from_indices(
+                self.n,
+                np.union1d(self._indices, other._indices),
+                assume_sorted=True,
+            )
+        return Mask._from_bits(self.n, self._packed() | other._packed())
+
+    def __and__(self, other):
+        self._check(other)
+        if self.kind == "full":
+            return other
+        if other.kind == "full":
+            return self
+        if self.kind == "index":
+            indices = self._indices[other.contains(self._indices)]
+            return Mask.from_indices(self.n, indices, assume_sorted=True)
+        if other.kind == "index":
+            return other & self
+        return Mask._from_bits(self.n, self._packed() & other._packed())
+
+    def __sub__(self, other):
+        self._check(other)
+        if self.kind == "index":
+            indices = self._indices[~other.contains(self._indices)]
+            return Mask.from_indices(self.n, indices, assume_sorted=True)
+        return Mask._from_bits(self.n, self._packed() & ~other._packed())
+
+    def __xor__(self, other):
+        self._check(other)
+        if self.kind == other.kind == "index":
+            return Mask.from_indices(
+                self.n,
+                np.setxor1d(self._indices, other._indices, assume_unique=True),
+                assume_sorted=True,
+            )
+        return Mask._from_bits(self.n, self._packed() ^ other._packed())
+
+
+def _itype(n):
+    """Smallest signed integer type indexing n particles."""
+    return np.int32 if n <= np.iinfo(np.int32).max else np.int64
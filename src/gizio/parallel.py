@@ -0,0 +1,34 @@
+"""Process-pool parallel analysis."""
+from concurrent.futures import ProcessPoolExecutor
+
+
+def parallel_map(func, items, n_workers=None, chunksize=1):
+    """Map a function over snapshots or particle selectors in processes.
+
+    Snapshots and particle selectors are pickled lightly, as file paths,
+    specification, metadata catalog and compact masks, without cached fields.
+    Workers reopen files on access. The function and its results must be
+    picklable, e.g. a module-level function returning arrays or numbers.
+
+    Parameters
+    ----------
+    func : callable
+        The function, called with each item.
+    items : iterable
+        Snapshots, particle selectors or other picklable items.
+    n_workers : int, optional
+        Number of worker processes. If 1, map in the calling process.
+        (default: number of CPUs)
+    chunksize : int, optional
+        Number of items sent to a worker at a time. (default: 1)
+
+    Returns
+    -------
+    list
+        Results, in items order.
+
+    """
+    if n_workers == 1:
+        return [func(item) for item in items]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(func, items, chunksize=chunksize))
@@ -0,0 +1,165 @@
+"""Pooled HDF5 file handles."""
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import threading
+
+import h5py
+
+from .stats import span
+
+
+class FilePool:
+    """Bounded pool of lazily opened, reusable HDF5 file handles.
+
+    Handles are opened on first use and kept open for later reads. When more
+    than ``max_open`` handles are idle, the least recently used ones are
+    closed. Handles in use are never closed by the pool.
+
+    .. describe:: len(pool)
+
+        Return the number of managed paths.
+
+    Parameters
+    ----------
+    paths : typing.Iterable
+        File paths. Handles are addressed by index into this sequence.
+    max_open : int, optional
+        Maximum number of handles kept open. (default: 16)
+    chunk_cache : dict, optional
+        h5py raw data chunk cache settings passed to :class:`h5py.File`, any
+        of ``rdcc_nbytes``, ``rdcc_nslots`` and ``rdcc_w0``. (default: h5py
+        defaults)
+    n_workers : int, optional
+        Number of threads used by :meth:`map`. (default: 1)
+    stats : gizio.stats.StatsCollector, optional
+        Collector timing file opens. (default: none)
+
+    Attributes
+    ----------
+    paths : list
+        File paths.
+    max_open : int
+        Maximum number of handles kept open.
+    chunk_cache : dict
+        h5py raw data chunk cache settings.
+    n_workers : int
+        Number of threads used by :meth:`map`.
+    stats : gizio.stats.StatsCollector or None
+        Collector timing file opens.
+
+    """
+
+    def __init__(
+        self, paths, max_open=16, chunk_cache=None, n_workers=1, stats=None
+    ):
+        if max_open < 1:
+            raise ValueError("max_open must be positive")
+        if n_workers < 1:
+            raise ValueError("n_workers must be positive")
+        self.paths = list(paths)
+        self.max_open = max_open
+        self.chunk_cache = dict(chunk_cache) if chunk_cache else {}
+        self.n_workers = n_workers
+        self.stats = stats
+        self._handles = OrderedDict()
+        self._in_use = Counter()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def n_open(self):
+        """int: Number of currently open handles."""
+        return len(self._handles)
+
+    @contextmanager
+    def get(self, index):
+        """Borrow the handle of a file, opening it if necessary.
+
+        Parameters
+        ----------
+        index : int
+            Index of the file path.
+
+        Yields
+        ------
+        h5py.File
+            The open file handle, valid until the context exits.
+
+        """
+        with self._lock:
+            if index in self._handles:
+                self._handles.move_to_end(index)
+            else:
+                with span(self.stats, "open"):
+                    self._handles[index] = h5py.File(
+                        self.paths[index], "r", **self.chunk_cache
+                    )
+            self._in_use[index] += 1
+            handle = self._handles[index]
+            self._trim()
+        try:
+            yield handle
+        finally:
+            with self._lock:
+                self._in_use[index] -= 1
+                if self._in_use[index] == 0:
+                    del self._in_use[index]
+                self._trim()
+
+    def map(self, func, indices=None):
+        """Apply a function to the handles of several files.
+
+        With more than one worker, files are processed concurrently by a
+        thread pool. Results are always returned in indices order.
+
+        Parameters
+        ----------
+        func : typing.Callable
+            Function called as ``func(index, handle)``.
+        indices : typing.Iterable, optional
+            Indices of the files. (default: all files)
+
+        Returns
+        -------
+        list
+            Return values of func, in indices order.
+
+        """
+        indices = range(len(self)) if indices is None else list(indices)
+
+        def call(index):
+            with self.get(index) as handle:
+                return func(index, handle)
+
+        if self.n_workers > 1 and len(indices) > 1:
+            with ThreadPoolExecutor(self.n_workers) as executor:
+                return list(executor.map(call, indices))
+        return [call(index) for index in indices]
+
+    def _trim(self):
+        # Close least recently used idle handles beyond the bound
+        for index in list(self._handles):
+            if len(self._handles) <= self.max_open:
+                break
+            if index not in self._in_use:
+                self._handles.pop(index).close()
+
+    def close(self):
+        """Close all idle handles.
+
+        The pool stays usable and reopens files on demand.
+
+        """
+        with self._lock:
+            for index in list(self._handles):
+                if index not in self._in_use:
+                    self._handles.pop(index).close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
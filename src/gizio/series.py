@@ -0,0 +1,208 @@
+"""Snapshot time series."""
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+
+from .core import Snapshot, snapshot_paths
+from .spec import SPEC_REGISTRY
+
+
+def load_series(prefixes, suffix=".hdf5", spec="gizmo", **kwargs):
+    """Load a series of snapshots.
+
+    Parameters
+    ----------
+    prefixes : list
+        Snapshot file(s) prefixes, in order.
+    suffix : str, optional
+        Snapshot file(s) suffix. (default: ".hdf5")
+    spec : str or SpecBase, optional
+        Snapshot format specification shared by all snapshots. If given as
+        str, will use a built-in one. (default: "gizmo")
+    **kwargs
+        Series options ``fields``, ``window`` and ``prefetch``, and snapshot
+        options. See :class:`SnapshotSeries`.
+
+    Returns
+    -------
+    SnapshotSeries
+        The snapshot series.
+
+    """
+    if isinstance(spec, str):
+        spec = SPEC_REGISTRY[spec]()
+    paths = [snapshot_paths(prefix, suffix) for prefix in prefixes]
+    return SnapshotSeries(paths, spec, **kwargs)
+
+
+class SnapshotSeries:
+    """Ordered snapshots with a bounded window and background prefetch.
+
+    Snapshots are loaded on access and share the specification, and thereby
+    cosmology calculators and age tables. When a snapshot is accessed, the
+    next one is loaded and its requested fields read in a background thread,
+    overlapping I/O with analysis of the current one. At most ``window``
+    snapshots are kept resident, least recently used ones are released and
+    their files closed.
+
+    .. describe:: len(series)
+
+        Return the number of snapshots.
+
+    .. describe:: series[index]
+
+        Return the snapshot, loading it if not resident.
+
+    .. describe:: iter(series)
+
+        Iterate over snapshots in order.
+
+    Parameters
+    ----------
+    paths : list
+        File paths of each snapshot.
+    spec : SpecBase
+        Snapshot format specification.
+    fields : list, optional
+        Fields read ahead, as (selector, key) pairs of a ``snap.pt`` name and
+        a field key, e.g. ``("gas", "t")``, or as (ptype, field) snapshot
+        keys. (default: none)
+    window : int, optional
+        Maximum number of resident snapshots. Prefetch needs at least 2.
+        (default: 2)
+    prefetch : bool, optional
+        Whether to load the next snapshot in the background. (default: True)
+    **kwargs
+        Snapshot options. See :class:`gizio.core.Snapshot`.
+
+    Attributes
+    ----------
+    paths : list
+        File paths of each snapshot.
+    spec : SpecBase
+        Snapshot format specification.
+    fields : list
+        Fields read ahead.
+    window : int
+        Maximum number of resident snapshots.
+    prefetch : bool
+        Whether to load the next snapshot in the background.
+
+    """
+
+    def __init__(
+        self, paths, spec, fields=(), window=2, prefetch=True, **kwargs
+    ):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.paths = list(paths)
+        self.spec = spec
+        self.fields = list(fields)
+        self.window = window
+        self.prefetch = prefetch and window > 1
+        self._kwargs = kwargs
+        self._resident = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("snapshot index out of range")
+        with self._lock:
+            future = self._resident.get(index)
+            if future is None:
+                future = Future()
+                self._resident[index] = future
+                load = True
+            else:
+                self._resident.move_to_end(index)
+                load = False
+        if load:
+            # Load in the caller thread rather than wait behind prefetches
+            try:
+                future.set_result(self._load(index))
+            except Exception as exc:  # pylint: disable=broad-except
+                # Any error is handed to threads waiting on the future
+                future.set_exception(exc)
+            finally:
+                if not future.done():
+                    # Interrupted, release waiting threads
+                    future.cancel()
+                if future.cancelled() or future.exception() is not None:
+                    with self._lock:
+                        self._resident.pop(index, None)
+        if self.prefetch and index + 1 < len(self):
+            self._prefetch(index + 1)
+        self._trim(keep=(index, index + 1))
+        return future.result()
+
+    @property
+    def resident(self):
+        """list: Indices of resident snapshots, least recently used first."""
+        with self._lock:
+            return list(self._resident)
+
+    def _load(self, index):
+        snap = Snapshot(self.paths[index], self.spec, **self._kwargs)
+        for name, key in self.fields:
+            # Cache the fields, the values are not needed here
+            if name in snap.pt:
+                _ = snap.pt[name][key]
+            elif (name, key) in snap.keys():
+                _ = snap[name, key]
+        return snap
+
+    def _prefetch(self, index):
+        with self._lock:
+            if index in self._resident:
+                self._resident.move_to_end(index)
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+            self._resident[index] = self._executor.submit(self._load, index)
+
+    def _trim(self, keep):
+        """Release least recently used snapshots beyond the window."""
+        released = []
+        with self._lock:
+            for index in list(self._resident):
+                if len(self._resident) <= self.window:
+                    break
+                if index not in keep:
+                    released += [self._resident.pop(index)]
+        for future in released:
+            if not future.cancel():
+                future.add_done_callback(_close)
+
+    def close(self):
+        """Release all snapshots and stop prefetching."""
+        with self._lock:
+            released = list(self._resident.values())
+            self._resident.clear()
+            executor, self._executor = self._executor, None
+        for future in released:
+            if not future.cancel():
+                future.add_done_callback(_close)
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _close(future):
+    """Close the snapshot of a finished future, if loaded."""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
@@ -0,0 +1,155 @@
+"""Spatial indexing of particle positions."""
+from itertools import product
+
+import numpy as np
+
+
+class SpatialIndex:
+    """Uniform grid index of particle positions, optionally periodic.
+
+    Particles are bucketed into cubic cells and sorted by cell, so a query
+    only computes distances for particles in cells overlapping the region.
+
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        Particle positions of shape (n, 3).
+    box_size : float, optional
+        Periodic box size. If not positive, positions are not wrapped.
+        (default: 0.0)
+    n_cell : int, optional
+        Number of cells per side. (default: about 16 particles per cell, at
+        most 128 cells per side)
+
+    Attributes
+    ----------
+    box_size : float
+        Periodic box size, not positive if not periodic.
+    n_cell : int
+        Number of cells per side.
+
+    """
+
+    def __init__(self, positions, box_size=0.0, n_cell=None):
+        positions = np.asarray(positions)
+        n_part = len(positions)
+        if n_cell is None:
+            n_cell = int(np.clip(round((n_part / 16) ** (1 / 3)), 1, 128))
+        self.box_size = float(box_size)
+        self.n_cell = n_cell
+        self._positions = positions
+
+        # Grid geometry
+        if self.periodic:
+            self._origin = np.zeros(3)
+            self._cell_size = self.box_size / n_cell
+        else:
+            lo = positions.min(axis=0) if n_part else np.zeros(3)
+            hi = positions.max(axis=0) if n_part else np.ones(3)
+            self._origin = lo
+            self._cell_size = max((hi - lo).max(), np.finfo(float).tiny)
+            self._cell_size /= n_cell
+
+        # Sort particles by cell
+        cell_ids = self._cell_ids(self._cell_coords(positions))
+        self._order = np.argsort(cell_ids, kind="stable")
+        self._bounds = np.searchsorted(
+            cell_ids[self._order], np.arange(n_cell ** 3 + 1)
+        )
+
+    @property
+    def periodic(self):
+        """bool: Whether positions are wrapped periodically."""
+        return self.box_size > 0
+
+    def _cell_coords(self, positions):
+        coords = np.floor((positions - self._origin) / self._cell_size)
+        if self.periodic:
+            return coords.astype(np.int64) % self.n_cell
+        return np.clip(coords, 0, self.n_cell - 1).astype(np.int64)
+
+    def _cell_ids(self, coords):
+        return (coords[..., 0] * self.n_cell + coords[..., 1]) * (
+            self.n_cell
+        ) + coords[..., 2]
+
+    def _candidates(self, lo, hi):
+        """Indices of particles in cells overlapping [lo, hi]."""
+        axes = []
+        for axis in range(3):
+            first, last = np.floor(
+                (np.array([lo[axis], hi[axis]]) - self._origin[axis])
+                / self._cell_size
+            ).astype(np.int64)
+            if self.periodic:
+                if last - first + 1 >= self.n_cell:
+                    cells = np.arange(self.n_cell)
+                else:
+                    cells = np.arange(first, last + 1) % self.n_cell
+            else:
+                first, last = np.clip([first, last], 0, self.n_cell - 1)
+                cells = np.arange(first, last + 1)
+            axes += [cells]
+        cell_ids = self._cell_ids(np.array(list(product(*axes))))
+        starts = self._bounds[cell_ids]
+        stops = self._bounds[cell_ids + 1]
+        lengths = stops - starts
+        # Concatenate the index ranges of all cells
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self._order[offsets + np.arange(lengths.sum())]
+
+    def _separation(self, indices, center):
+        delta = self._positions[indices] - center
+        if self.periodic:
+            delta -= self.box_size * np.round(delta / self.box_size)
+        return delta
+
+    def query_sphere(self, center, radius, inner=0.0):
+        """Find particles in a sphere or spherical shell.
+
+        Parameters
+        ----------
+        center : array_like
+            Center position.
+        radius : float
+            Outer radius, exclusive.
+        inner : float, optional
+            Inner radius, inclusive. (default: 0.0)
+
+        Returns
+        -------
+        numpy.ndarray
+            Sorted particle indices.
+
+        """
+        center = np.asarray(center, dtype=float)
+        candidates = self._candidates(center - radius, center + radius)
+        delta = self._separation(candidates, center)
+        r2 = np.einsum("ij,ij->i", delta, delta)
+        selected = (r2 < radius ** 2) & (r2 >= inner ** 2)
+        return np.sort(candidates[selected])
+
+    def query_box(self, lo, hi):
+        """Find particles in an axis-aligned box.
+
+        Parameters
+        ----------
+        lo : array_like
+            Lower corner, inclusive.
+        hi : array_like
+            Upper corner, exclusive.
+
+        Returns
+        -------
+        numpy.ndarray
+            Sorted particle indices.
+
+        """
+        lo = np.asarray(lo, dtype=float)
+        hi = np.asarray(hi, dtype=float)
+        center = (lo + hi) / 2
+        half = (hi - lo) / 2
+        candidates = self._candidates(lo, hi)
+        delta = self._separation(candidates, center)
+        selected = np.all((delta >= -half) & (delta < half), axis=1)
+        return np.sort(candidates[selected])
@@ -2,76 +2,180 @@
 import abc
 from collections import OrderedDict
 
-from astropy.cosmology import LambdaCDM
-import h5py
 import numpy as np
 import unyt
 
+from .catalog import Catalog
+from .cosmology import lambda_cdm
+from .kernel import FieldKernel
+from .lazy import raw
+from .stats import span
+
 
 SPEC_REGISTRY = {}
 
+_MKS_UNITS = {}
+
+
+def _mks(unit):
+    """MKS base value and dimensions of a physical unit, memoized."""
+    if unit not in _MKS_UNITS:
+        value = unyt.unyt_quantity(1.0, unit)
+        base_value = float(value.in_base(unit_system="mks"))
+        _MKS_UNITS[unit] = (base_value, value.units.dimensions)
+    return _MKS_UNITS[unit]
+
+
+def resolve_dtype(policy, dtype):
+    """Data type of a field under a dtype policy.
+
+    Parameters
+    ----------
+    policy : str or numpy.dtype or None
+        ``"native"`` or None to keep the data type, ``"downcast"`` to turn
+        double into single precision floats, ``"upcast"`` to turn lower into
+        double precision floats, or an explicit data type.
+    dtype : numpy.dtype
+        The native data type.
+
+    Returns
+    -------
+    numpy.dtype
+        The resulting data type.
+
+    """
+    dtype = np.dtype(dtype)
+    if policy is None or policy == "native":
+        return dtype
+    if policy == "downcast":
+        if dtype.kind == "f" and dtype.itemsize > 4:
+            return np.dtype("f4")
+        return dtype
+    if policy == "upcast":
+        if dtype.kind == "f" and dtype.itemsize < 8:
+            return np.dtype("f8")
+        return dtype
+    return np.dtype(policy)
+
 
 class SpecBase(abc.ABC):
     """Snapshot format specification base class."""
 
     HEADER_BLOCK = None
     HEADER_N_PART = None
+    HEADER_N_PART_PF = None
+    HEADER_N_FILE = None
+    HEADER_BOX_SIZE = None
     HEADER_PER_FILE = None
     HEADER_SPEC = None
     UNIT_SPEC = None
     PTYPE_SPEC = None
     FIELD_SPEC = None
+    COMPONENT_SPEC = []
+    POSITION_FIELD = None
+    ID_FIELD = None
+    # Default dtype policy, see resolve_dtype
+    DTYPE_POLICY = "native"
+    # Per-field dtype policies, {raw_field_or_derived_key: policy}
+    DTYPE_SPEC = {}
 
     def __init__(self):
         # Parse ptype spec
         self.ptypes = []
         self.ptype_abbrs = {}
-        for raw, abbr in self.PTYPE_SPEC:
-            self.ptypes += [raw]
-            self.ptype_abbrs[raw] = abbr
+        for ptype, abbr in self.PTYPE_SPEC:
+            self.ptypes += [ptype]
+            self.ptype_abbrs[ptype] = abbr
 
         # Parse field spec
         self.fields = []
         self.field_abbrs = {}
         self.field_units = {}
-        for raw, abbr, unit in self.FIELD_SPEC:
-            self.fields += [raw]
-            self.field_abbrs[raw] = abbr
-            self.field_units[raw] = unit
+        for field, abbr, unit in self.FIELD_SPEC:
+            self.fields += [field]
+            self.field_abbrs[field] = abbr
+            self.field_units[field] = unit
+
+        # Parse component spec
+        self.field_components = {}
+        for field, column, abbr in self.COMPONENT_SPEC:
+            self.field_components[abbr] = (field, column)
 
-    def apply_to(self, snap):
+    def apply_to(self, snap, catalog=None):
         """Apply specification to snapshot.
 
         Parameters
         ----------
         snap : Snapshot
             The snapshot to apply to.
+        catalog : Catalog, optional
+            Snapshot metadata catalog. (default: read from the files)
 
         Returns
         -------
+        catalog : Catalog
+            Snapshot metadata catalog.
         header : dict
             Snapshot header.
         shape : collections.OrderedDict
             Data shape composed of {ptype_name: n_part} entries, in the
             specification ptypes order.
+        file_shapes : list
+            Per-file data shapes, in the same format as ``shape``.
         cosmology : astropy.cosmology.LambdaCDM
             An astropy cosmology calculator.
         unit_registry : unyt.unit_registry.UnitRegistry
             Simulation unit registry.
 
         """
-        header = self._read_header(snap)
-        shape = self._get_shape(header)
-        a, h, cosmology = self._get_cosmology(header)
-        unit_registry = self._create_unit_registry(a, h)
-        self._add_header_units(header, unit_registry)
-        return header, shape, cosmology, unit_registry
-
-    def _read_header(self, snap):
-        headers = []
-        for path in snap.paths:
-            with h5py.File(path, "r") as f:
-                headers += [dict(f[self.HEADER_BLOCK].attrs)]
+        with span(snap.collector, "apply_to"):
+            if catalog is None:
+                with span(snap.collector, "catalog"):
+                    catalog = Catalog.read(
+                        snap.files,
+                        self.HEADER_BLOCK,
+                        self.ptypes,
+                        snap.sidecar,
+                    )
+            header = self._read_header(catalog)
+            shape = self._get_shape(header)
+            file_shapes = self._get_file_shapes(header)
+            a, h, cosmology = self._get_cosmology(header)
+            unit_registry = self._create_unit_registry(a, h)
+            self._add_header_units(header, unit_registry)
+        return catalog, header, shape, file_shapes, cosmology, unit_registry
+
+    def merge_headers(self, catalog):
+        """Raw header attributes of a single file holding all particles.
+
+        Per-file attributes are summed over files.
+
+        Parameters
+        ----------
+        catalog : Catalog
+            Snapshot metadata catalog.
+
+        Returns
+        -------
+        dict
+            Raw header attributes.
+
+        """
+        headers = catalog.headers
+        header = dict(headers[0])
+        for key in self.HEADER_PER_FILE:
+            value = np.asarray(headers[0][key])
+            header[key] = np.sum(
+                [h[key] for h in headers], axis=0, dtype=value.dtype
+            )
+        raw_keys = {alias: key for key, alias in self.HEADER_SPEC}
+        if self.HEADER_N_FILE is not None:
+            key = raw_keys[self.HEADER_N_FILE]
+            header[key] = np.asarray(1, dtype=np.asarray(header[key]).dtype)
+        return header
+
+    def _read_header(self, catalog):
+        headers = catalog.headers
 
         header = {}
         for key, alias in self.HEADER_SPEC:
@@ -84,6 +188,12 @@ class SpecBase(abc.ABC):
     def _get_shape(self, header):
         return OrderedDict(zip(self.ptypes, header[self.HEADER_N_PART]))
 
+    def _get_file_shapes(self, header):
+        return [
+            OrderedDict(zip(self.ptypes, n_part_pf))
+            for n_part_pf in header[self.HEADER_N_PART_PF]
+        ]
+
     # Reference:
     # http://www.tapir.caltech.edu/~phopkins/Site/GIZMO_files/gizmo_documentation.html#snaps-units
     def _create_unit_registry(self, a, h):
@@ -96,10 +206,9 @@ class SpecBase(abc.ABC):
         reg = unyt.UnitRegistry()
 
         def def_unit(symbol, value):
-            value = unyt.unyt_quantity(*value, registry=reg)
-            base_value = float(value.in_base(unit_system="mks"))
-            dimensions = value.units.dimensions
-            reg.add(symbol, base_value, dimensions)
+            value, unit = value
+            base_value, dimensions = _mks(unit)
+            reg.add(symbol, value * base_value, dimensions)
 
         def_unit("a", (a, ""))
         def_unit("h", (h, ""))
@@ -113,7 +222,10 @@ class SpecBase(abc.ABC):
         def_unit(
             "code_specific_energy", (unit_velocity_cgs ** 2, "(cm / s)**2")
         )
-        def_unit("code_time", (1, "code_length / code_velocity"))
+        def_unit(
+            "code_time",
+            (unit_length_cgs / h * a / (unit_velocity_cgs * np.sqrt(a)), "s"),
+        )
 
         return reg
 
@@ -144,6 +256,9 @@ class GIZMOSpec(SpecBase):
 
     HEADER_BLOCK = "Header"
     HEADER_N_PART = "n_part"
+    HEADER_N_PART_PF = "n_part_pf"
+    HEADER_N_FILE = "n_file"
+    HEADER_BOX_SIZE = "box_size"
     HEADER_PER_FILE = ["NumPart_ThisFile"]
     HEADER_SPEC = [
         # (name, key)
@@ -204,10 +319,26 @@ class GIZMOSpec(SpecBase):
         ("BH_Mdot", "mdot", "code_mass / code_time"),
         ("BH_Mass_AlphaDisk", "mad", "code_mass"),
     ]
+    COMPONENT_SPEC = [
+        # (name, column, key), read without the other columns
+        ("Coordinates", 0, "px"),
+        ("Coordinates", 1, "py"),
+        ("Coordinates", 2, "pz"),
+        ("Velocities", 0, "vx"),
+        ("Velocities", 1, "vy"),
+        ("Velocities", 2, "vz"),
+        ("MagneticField", 0, "bx"),
+        ("MagneticField", 1, "by"),
+        ("MagneticField", 2, "bz"),
+        ("Metallicity", 0, "z_met"),
+        ("Metallicity", 1, "z_he"),
+    ]
+    POSITION_FIELD = "Coordinates"
+    ID_FIELD = "ParticleIDs"
 
     def _get_cosmology(self, header):
         h = header["h"]
-        cosmology = LambdaCDM(h * 100, header["Om0"], header["OmL"])
+        cosmology = lambda_cdm(h * 100, header["Om0"], header["OmL"])
 
         a = header["time"]
         z = header["z"]
@@ -249,34 +380,35 @@ class GIZMOSpec(SpecBase):
             ps.register_field("age", self.compute_age)
 
     @staticmethod
-    def compute_age(ps):
+    def compute_age(ps, exact=False):
         """Compute age from formation time.
 
         Parameters
         ----------
         ps : ParticleSelector
             A particle selector.
+        exact : bool, optional
+            Convert formation scale factors exactly instead of through the
+            cached age table. (default: False)
 
         Returns
         -------
         unyt.unyt_array
-            The age array.
+            The age array, in the precision of formation times.
 
         """
         # See the note following StellarFormationTime on this page:
         # http://www.tapir.caltech.edu/~phopkins/Site/GIZMO_files/gizmo_documentation.html#snaps-reading
-        sft = ps["sft"].d
+        sft = raw(ps["sft"])
 
         snap = ps.snap
         if snap.header["cosmological"]:
             a_form = sft
-            z_form = 1 / a_form - 1
-            t_form = snap.cosmology.age(z_form).to_value("Gyr")
-            t_form = snap.array(t_form, "Gyr")
+            t_form = snap.cosmic_time(a_form, exact=exact)
         else:
             t_form = snap.array(sft, "code_time")
         age = snap.header["time"] - t_form
-        return age.to("Gyr")
+        return age.to("Gyr").astype(sft.dtype)
 
     @staticmethod
     def compute_temperature(ps):
@@ -293,20 +425,31 @@ class GIZMOSpec(SpecBase):
             The temperature array.
 
         """
-        # See the note following InternalEnergy on this page:
-        # http://www.tapir.caltech.edu/~phopkins/Site/GIZMO_files/gizmo_documentation.html#snaps-reading
-        ne = ps["ne"]
-        u = ps["u"]
-        z_he = ps["z"][:, 1]
-
-        from unyt.physical_constants import kb, mp
-
-        gamma = 5 / 3
-
-        y = z_he / (4 * (1 - z_he))
-        mu = (1 + 4 * y) / (1 + y + ne)
-        temperature = mu * mp * (gamma - 1) * u / kb
-        return temperature.to("K")
+        return _TEMPERATURE_KERNEL(ps)
+
+
+def _temperature(z_he, ne, u):
+    """Temperature in K from helium mass fraction, ne and u in (cm/s)**2."""
+    # See the note following InternalEnergy on this page:
+    # http://www.tapir.caltech.edu/~phopkins/Site/GIZMO_files/gizmo_documentation.html#snaps-reading
+    y = z_he / (4 * (1 - z_he))
+    mu = (1 + 4 * y) / (1 + y + ne)
+    mu *= _TEMPERATURE_FACTOR
+    mu *= u
+    return mu
+
+
+# mp * (gamma - 1) / kb with gamma = 5 / 3, in K / (cm / s)**2
+_TEMPERATURE_FACTOR = float(
+    (unyt.physical_constants.mp * (5 / 3 - 1) / unyt.physical_constants.kb)
+    .to_value("K * s**2 / cm**2")
+)
+
+_TEMPERATURE_KERNEL = FieldKernel(
+    _temperature,
+    [("z_he", ""), ("ne", ""), ("u", "cm**2 / s**2")],
+    "K",
+)
 
 
 SPEC_REGISTRY["gizmo"] = GIZMOSpec
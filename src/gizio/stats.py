@@ -0,0 +1,184 @@
+"""Opt-in I/O and compute statistics."""
+from collections import namedtuple
+from contextlib import contextmanager
+import threading
+import time
+
+
+Event = namedtuple(
+    "Event", ["stage", "key", "start", "seconds", "nbytes", "hit"]
+)
+Event.__doc__ = """A timed stage, passed to statistics callbacks.
+
+``start`` is a :func:`time.perf_counter` timestamp, ``key`` the field key or
+None, ``nbytes`` the bytes read and ``hit`` whether a field lookup hit the
+cache, or None for other stages.
+"""
+
+StageStats = namedtuple("StageStats", ["calls", "seconds", "nbytes"])
+StageStats.__doc__ = """Totals of a stage, with wall time in seconds."""
+
+FieldStats = namedtuple(
+    "FieldStats", ["calls", "hits", "misses", "seconds", "nbytes"]
+)
+FieldStats.__doc__ = """Totals of a field key, with wall time of lookups.
+
+Lookups are counted for snapshot keys and particle selector keys, and bytes
+read for snapshot keys.
+"""
+
+Stats = namedtuple("Stats", ["stages", "fields"])
+Stats.__doc__ = """Statistics of stages and fields, keyed by name."""
+
+
+class _Span:
+    """Mutable outcome of a timed stage."""
+
+    __slots__ = ("nbytes", "hit")
+
+    def __init__(self):
+        self.nbytes = 0
+        self.hit = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class StatsCollector:
+    """Thread-safe collector of timed stages.
+
+    Stages are ``"apply_to"`` and ``"catalog"`` for metadata, ``"open"`` for
+    file opens, ``"read"`` for field reads including decompression,
+    ``"units"`` for attaching units, ``"getitem"`` and ``"field"`` for
+    snapshot and particle selector field lookups, ``"graph"`` for building
+    lazy snapshot fields, ``"direct"`` and ``"derived"`` for computing
+    selector fields and ``"concatenate"`` for joining particle types. Stages
+    nest, e.g. a ``"field"`` lookup may include ``"direct"``, ``"getitem"``
+    and ``"read"`` stages. Lazy fields are read on compute, outside of any
+    stage, so their reads are not timed.
+
+    Parameters
+    ----------
+    callbacks : list, optional
+        Functions called with each :class:`Event` as it completes, possibly
+        from reader threads. (default: none)
+
+    Attributes
+    ----------
+    callbacks : list
+        Functions called with each event.
+
+    """
+
+    def __init__(self, callbacks=()):
+        self.callbacks = list(callbacks)
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._fields = {}
+
+    @contextmanager
+    def span(self, stage, key=None):
+        """Time a stage.
+
+        Parameters
+        ----------
+        stage : str
+            The stage name.
+        key : str or tuple, optional
+            The field key. (default: none)
+
+        Yields
+        ------
+        object
+            Outcome with settable ``nbytes`` and ``hit`` attributes.
+
+        """
+        outcome = _Span()
+        start = time.perf_counter()
+        try:
+            yield outcome
+        finally:
+            seconds = time.perf_counter() - start
+            self.record(
+                Event(
+                    stage, key, start, seconds, outcome.nbytes, outcome.hit
+                )
+            )
+
+    def record(self, event):
+        """Add an event to the totals and pass it to callbacks.
+
+        Parameters
+        ----------
+        event : Event
+            The event.
+
+        """
+        with self._lock:
+            calls, seconds, nbytes = self._stages.get(
+                event.stage, StageStats(0, 0.0, 0)
+            )
+            self._stages[event.stage] = StageStats(
+                calls + 1, seconds + event.seconds, nbytes + event.nbytes
+            )
+            if event.key is not None and (
+                event.hit is not None or event.nbytes
+            ):
+                calls, hits, misses, seconds, nbytes = self._fields.get(
+                    event.key, FieldStats(0, 0, 0, 0.0, 0)
+                )
+                if event.hit is not None:
+                    calls += 1
+                    hits += bool(event.hit)
+                    misses += not event.hit
+                    seconds += event.seconds
+                self._fields[event.key] = FieldStats(
+                    calls, hits, misses, seconds, nbytes + event.nbytes
+                )
+        for callback in self.callbacks:
+            callback(event)
+
+    def report(self):
+        """Report totals.
+
+        Returns
+        -------
+        Stats
+            Totals of each stage and each field key.
+
+        """
+        with self._lock:
+            return Stats(dict(self._stages), dict(self._fields))
+
+    def reset(self):
+        """Clear totals."""
+        with self._lock:
+            self._stages.clear()
+            self._fields.clear()
+
+
+def span(collector, stage, key=None):
+    """Time a stage if statistics are collected.
+
+    Parameters
+    ----------
+    collector : StatsCollector or None
+        The collector, or None to skip timing.
+    stage : str
+        The stage name.
+    key : str or tuple, optional
+        The field key. (default: none)
+
+    Returns
+    -------
+    contextlib.AbstractContextManager
+        Context manager yielding an outcome with settable ``nbytes`` and
+        ``hit`` attributes.
+
+    """
+    if collector is None:
+        return _Span()
+    return collector.span(stage, key)
@@ -0,0 +1,185 @@
+"""Synthetic GIZMO snapshots for tests and benchmarks."""
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from .spec import GIZMOSpec
+
+
+# Fields written per particle type, by specification ptype key
+PTYPE_FIELDS = {
+    "gas": [
+        "Coordinates",
+        "Velocities",
+        "ParticleIDs",
+        "Masses",
+        "InternalEnergy",
+        "Density",
+        "SmoothingLength",
+        "ElectronAbundance",
+        "NeutralHydrogenAbundance",
+        "StarFormationRate",
+        "Metallicity",
+    ],
+    "star": [
+        "Coordinates",
+        "Velocities",
+        "ParticleIDs",
+        "Masses",
+        "Metallicity",
+        "StellarFormationTime",
+    ],
+    "bh": [
+        "Coordinates",
+        "Velocities",
+        "ParticleIDs",
+        "Masses",
+        "BH_Mass",
+        "BH_Mdot",
+    ],
+}
+DEFAULT_FIELDS = ["Coordinates", "Velocities", "ParticleIDs", "Masses"]
+N_METAL = 11
+
+
+def _generate(field, rng, count, box_size, a):
+    """Draw values of a field for a number of particles."""
+    if field == "Coordinates":
+        return rng.uniform(0, box_size, (count, 3))
+    if field == "Velocities":
+        return rng.normal(0, 100, (count, 3)).astype("f4")
+    if field == "Metallicity":
+        return rng.uniform(0, 0.05, (count, N_METAL)).astype("f4")
+    low, high = {
+        "Masses": (1e-6, 2e-6),
+        "InternalEnergy": (1.0, 1e4),
+        "Density": (1e-8, 1e-2),
+        "SmoothingLength": (0.01, 1.0),
+        "ElectronAbundance": (0.0, 1.2),
+        "NeutralHydrogenAbundance": (0.0, 1.0),
+        "StarFormationRate": (0.0, 1e-3),
+        # Stars form before the snapshot time
+        "StellarFormationTime": (0.05 * a, a),
+        "BH_Mass": (1e-5, 1e-3),
+        "BH_Mdot": (0.0, 1e-4),
+    }[field]
+    return rng.uniform(low, high, count).astype("f4")
+
+
+def write_snapshot(
+    prefix,
+    n_part,
+    n_file=1,
+    chunks=None,
+    compression=None,
+    seed=0,
+    box_size=1000.0,
+    a=1.0,
+):
+    """Write a synthetic snapshot in the GIZMO format.
+
+    Particles are uniformly distributed in the box with random field values
+    of plausible ranges, and unique particle IDs. Each file is generated
+    independently, so memory is bounded by the largest file.
+
+    Parameters
+    ----------
+    prefix : str or pathlib.Path
+        Snapshot path without suffix, e.g. ``"output/snapshot_600"``.
+    n_part : list or dict
+        Number of particles per particle type, in the specification ptypes
+        order or as {ptype_key: n_part} entries, e.g. ``{"gas": 1000}``.
+    n_file : int, optional
+        Number of files, written as ``<prefix>.<i>.hdf5`` if more than one.
+        (default: 1)
+    chunks : int or bool, optional
+        Dataset chunk length in rows, or True for h5py automatic chunking.
+        (default: contiguous unless compressed)
+    compression : str, optional
+        h5py dataset compression filter, e.g. ``"gzip"``. (default: none)
+    seed : int, optional
+        Random seed. (default: 0)
+    box_size : float, optional
+        Box size in code length. (default: 1000.0)
+    a : float, optional
+        Scale factor. (default: 1.0)
+
+    Returns
+    -------
+    list
+        Written file paths.
+
+    """
+    spec = GIZMOSpec()
+    if isinstance(n_part, dict):
+        n_part = [n_part.get(abbr, 0) for abbr in spec.ptype_abbrs.values()]
+    n_part = np.asarray(n_part, dtype="u4")
+    if len(n_part) != len(spec.ptypes):
+        raise ValueError("n_part must have one entry per particle type")
+    prefix = Path(prefix)
+    prefix.parent.mkdir(parents=True, exist_ok=True)
+
+    # Per-file row ranges of each particle type
+    bounds = [np.linspace(0, n, n_file + 1).astype(int) for n in n_part]
+    id_offsets = np.concatenate([[0], np.cumsum(n_part, dtype="u8")])
+    header_keys = {key: name for name, key in spec.HEADER_SPEC}
+    h = 0.702
+    header = {
+        "time": a,
+        "n_file": n_file,
+        "mass_tab": np.zeros(len(spec.ptypes)),
+        "f_sfr": 1,
+        "f_cool": 1,
+        "f_fb": 1,
+        "f_age": 1,
+        "f_met": N_METAL,
+        "n_part": n_part,
+        "box_size": box_size,
+        "Om0": 0.272,
+        "OmL": 0.728,
+        "h": h,
+        "z": 1 / a - 1,
+    }
+
+    paths = []
+    for index in range(n_file):
+        if n_file > 1:
+            path = Path(f"{prefix}.{index}.hdf5")
+        else:
+            path = Path(f"{prefix}.hdf5")
+        rng = np.random.default_rng([seed, index])
+        starts = [int(bound[index]) for bound in bounds]
+        stops = [int(bound[index + 1]) for bound in bounds]
+        counts = np.subtract(stops, starts).astype("i4")
+        with h5py.File(path, "w") as h5f:
+            attrs = h5f.create_group(spec.HEADER_BLOCK).attrs
+            for key, value in header.items():
+                attrs[header_keys[key]] = value
+            attrs[header_keys["n_part_pf"]] = counts
+            for i, (ptype, abbr) in enumerate(spec.ptype_abbrs.items()):
+                if counts[i] == 0:
+                    continue
+                group = h5f.create_group(ptype)
+                for field in PTYPE_FIELDS.get(abbr, DEFAULT_FIELDS):
+                    if field == "ParticleIDs":
+                        value = (
+                            np.arange(starts[i], stops[i], dtype="u8")
+                            + id_offsets[i]
+                            + 1
+                        ).astype("u4")
+                    else:
+                        value = _generate(field, rng, counts[i], box_size, a)
+                    layout = chunks
+                    if isinstance(chunks, int) and not isinstance(
+                        chunks, bool
+                    ):
+                        layout = (min(chunks, len(value)),) + value.shape[1:]
+                    group.create_dataset(
+                        field,
+                        data=value,
+                        chunks=layout,
+                        compression=compression,
+                    )
+        paths += [path]
+    return paths
@@ -0,0 +1,104 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import gizio
+from gizio.analysis import Reduction
+
+
+SNAP_PATH = (
+    Path(__file__).parent / "data/FIRE_M12i_ref11/snapshot_600.hdf5"
+).resolve()
+
+
+def test_reduce():
+    """Test out-of-core reductions against materialized fields."""
+    snap = gizio.load(SNAP_PATH)
+    gas = snap.pt["gas"]
+    ops = {
+        "m": ["count", "sum", "min", "max", "std"],
+        ("t", "m"): "wmean",
+        "p": "mean",
+    }
+    result = gas.reduce(ops, chunk_size=100)
+    assert "t" not in gas._field_cache
+    m = gas["m"]
+    t = gas["t"]
+    assert result["m"]["count"] == len(gas)
+    assert result["m"]["sum"].units == m.units
+    assert np.isclose(result["m"]["sum"], m.sum())
+    assert result["m"]["min"] == m.min()
+    assert result["m"]["max"] == m.max()
+    assert np.isclose(result["m"]["std"].v, np.std(m.d.astype(float)))
+    assert np.isclose(
+        result["t", "m"].to_value("K"),
+        np.average(t.to_value("K"), weights=m.d.astype(float)),
+    )
+    assert np.allclose(result["p"].d, gas["p"].d.astype(float).mean(axis=0))
+
+    # Derived selectors, across particle types
+    hot_gas = gas[t.to_value("K") > 1e5]
+    baryon = hot_gas | snap.pt["star"]
+    assert np.isclose(baryon.reduce({"m": "sum"})["m"], baryon["m"].sum())
+
+
+def test_reduction():
+    """Test Reduction abstract base class."""
+
+    class Partial(Reduction):
+        def partial(self, values, weights=None):
+            return (len(values),)
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_histogram():
+    """Test binned histograms against numpy."""
+    snap = gizio.load(SNAP_PATH)
+    gas = snap.pt["gas"]
+    hist = gas.histogram(
+        ["rho", "t"],
+        bins=[20, 30],
+        log=True,
+        weights=["m", ("t", "m")],
+        chunk_size=100,
+    )
+    edges = [edge.d for edge in hist.edges]
+    rho = gas["rho"].d
+    t = gas["t"].to_value("K")
+    counts, _, _ = np.histogram2d(rho, t, bins=edges)
+    assert np.all(hist.counts == counts)
+    assert hist.counts.sum() == len(gas)
+    masses, _, _ = np.histogram2d(rho, t, bins=edges, weights=gas["m"].d)
+    assert np.allclose(hist.sums["m"].d, masses)
+    assert hist.mean("t", "m").units == gas["t"].units
+
+    # Unit-aware edges
+    edges = snap.array(np.linspace(1e6, 1e9, 11), "mK")
+    hist = gas.histogram(["t"], bins=edges)
+    counts, _ = np.histogram(t, bins=edges.to_value("K"))
+    assert np.all(hist.counts == counts)
+
+    # Bounds of numbers of bins
+    hist = gas.histogram(["t"], bins=10, bounds=[(1e3, 1e7)])
+    counts, _ = np.histogram(t, bins=10, range=(1e3, 1e7))
+    assert np.all(hist.counts == counts)
+
+
+def test_profile():
+    """Test binned mean profiles."""
+    snap = gizio.load(SNAP_PATH)
+    gas = snap.pt["gas"]
+    edges, means = gas.profile("rho", ["t"], weight="m", bins=5, log=True)
+    assert len(edges) == 6
+    bounded, _ = gas.profile("rho", ["t"], bins=5, bounds=(1e-6, 1e-2))
+    assert np.allclose(bounded[[0, -1]].d, [1e-6, 1e-2])
+    rho = gas["rho"].d
+    m = gas["m"].d
+    t = gas["t"].to_value("K")
+    inside = (rho >= edges[0].d) & (rho < edges[1].d)
+    assert np.isclose(
+        means["t"][0].to_value("K"), np.average(t[inside], weights=m[inside])
+    )
@@ -0,0 +1,96 @@
+from pathlib import Path
+
+import numpy as np
+
+import gizio
+from gizio.cache import CacheBudget, CacheInfo, FieldCache
+
+
+SNAP_PATH = (
+    Path(__file__).parent / "data/FIRE_M12i_ref11/snapshot_600.hdf5"
+).resolve()
+
+
+def test_field_cache():
+    """Test FieldCache and CacheBudget classes."""
+    budget = CacheBudget(max_bytes=2000)
+    cache1 = FieldCache(budget, "a")
+    cache2 = FieldCache(budget, "b")
+    cache1["x"] = np.zeros(100)
+    cache2["y"] = np.zeros(100)
+    assert budget.usage() == 1600
+    assert budget.usage("a") == 800
+    assert cache1.get("x") is not None
+    assert cache1.get("z") is None
+
+    # Least recently used entry is evicted first
+    cache2["z"] = np.zeros(100)
+    assert "y" not in cache2
+    assert "x" in cache1
+
+    # Entries in use are not evicted
+    x = cache1["x"]
+    cache2["w"] = np.zeros(100)
+    assert "x" in cache1
+    del x
+
+    info = budget.info()
+    assert isinstance(info, CacheInfo)
+    assert (info.hits, info.misses) == (1, 1)
+    assert info.evictions == 2
+    assert info.currsize <= info.maxsize == 2000
+
+    # Entries of collected caches are released
+    del cache2
+    assert budget.usage() == budget.usage("a") == 800
+    cache1.clear()
+    assert budget.usage() == 0
+
+
+def test_field_cache_in_use():
+    """Test evicting idle entries and keeping entries in use."""
+    for access in [FieldCache.get, FieldCache.peek]:
+        budget = CacheBudget(max_bytes=1600)
+        cache = FieldCache(budget, "a")
+        cache["x"] = np.zeros(100)
+        cache["y"] = np.zeros(100)
+        x = access(cache, "x")
+        access(cache, "y")
+        cache["z"] = np.zeros(100)
+        assert "y" not in cache
+        assert access(cache, "x") is x
+        assert sorted(cache) == ["x", "z"]
+        assert budget.info().evictions == 1
+
+        # Released once no longer in use
+        del x
+        assert "x" not in cache
+        assert budget.usage() == 800
+        assert budget.info().evictions == 2
+
+
+def test_snapshot_cache_budget():
+    """Test memory-budgeted snapshot caches."""
+    snap = gizio.load(SNAP_PATH, cache_bytes=0)
+    gas = snap.pt["gas"]
+    gas["m"]
+    rho = gas["rho"]
+    usage = snap.memory_usage()
+    assert usage["total"] == usage["snapshot"] + usage["selectors"]
+    assert usage["total"] == rho.nbytes
+    assert snap.cache_info().evictions > 0
+
+
+def test_cache_info_columns():
+    """Test column lookups counting one hit or miss each."""
+    snap = gizio.load(SNAP_PATH)
+    key = ("PartType0", "Metallicity", 1)
+    snap[key]
+    snap[key]
+    info = snap.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+    snap[key[:2]]
+    del snap[key]
+    snap[key]
+    info = snap.cache_info()
+    assert (info.hits, info.misses) == (2, 2)
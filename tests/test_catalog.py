@@ -0,0 +1,48 @@
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+import gizio
+from gizio.catalog import Catalog, FieldInfo
+
+
+SNAP_PATH = (
+    Path(__file__).parent / "data/FIRE_M12i_ref11/snapshot_600.hdf5"
+).resolve()
+
+
+def test_catalog():
+    """Test Catalog class."""
+    snap = gizio.load(SNAP_PATH)
+    catalog = snap.catalog
+    assert isinstance(catalog, Catalog)
+    assert len(catalog.headers) == len(snap.paths)
+    assert isinstance(catalog.fields, OrderedDict)
+    assert list(catalog.fields) == snap.keys()
+    for (ptype, field), info in catalog.fields.items():
+        assert isinstance(info, FieldInfo)
+        assert field in catalog.ptype_fields(ptype)
+        assert info.shape == snap[ptype, field].shape
+        assert info.dtype == snap[ptype, field].dtype
+        assert sum(info.counts) == snap.shape[ptype]
+
+
+def test_catalog_sidecar(tmp_path):
+    """Test catalog sidecar round trip."""
+    sidecar = tmp_path / "snapshot_600.gizio.json"
+    snap = gizio.load(SNAP_PATH, sidecar=sidecar)
+    assert sidecar.is_file()
+    catalog = Catalog.load(sidecar, snap.paths)
+    assert catalog.fields == snap.catalog.fields
+    for key, value in snap.catalog.headers[0].items():
+        assert np.all(catalog.headers[0][key] == value)
+
+    # Snapshots loaded from the sidecar are equivalent
+    snap2 = gizio.load(SNAP_PATH, sidecar=sidecar)
+    assert snap2.files.n_open == 0
+    assert snap2.keys() == snap.keys()
+    assert snap2.shape == snap.shape
+
+    # Stale sidecars are ignored
+    assert Catalog.load(sidecar, snap.paths * 2) is None
@@ -0,0 +1,41 @@
+from pathlib import Path
+import shutil
+
+import numpy as np
+import pytest
+
+import gizio
+
+
+SNAP_PATH = (
+    Path(__file__).parent / "data/FIRE_M12i_ref11/snapshot_600.hdf5"
+).resolve()
+
+
+def test_export_cache(tmp_path):
+    """Test exporting and reloading a columnar cache."""
+    snap = gizio.load(SNAP_PATH)
+    path = snap.export_cache(tmp_path, chunk_size=100)
+    assert path.parent == tmp_path
+    cache = gizio.load_cache(path)
+    assert cache.mmap
+    assert cache.keys() == snap.keys()
+    assert cache.shape == snap.shape
+    for key in snap.keys():
+        assert cache.mappable(key)
+        assert np.all(cache[key] == snap[key])
+        assert cache[key].units == snap[key].units
+    assert cache.header["time"] == snap.header["time"]
+    assert np.allclose(cache.pt["gas"]["t"], snap.pt["gas"]["t"])
+    assert np.allclose(cache.pt["star"]["age"], snap.pt["star"]["age"])
+
+    # Caches next to snapshot files neither clash with nor join them
+    snap_path = tmp_path / "snapdir" / SNAP_PATH.name
+    snap_path.parent.mkdir()
+    shutil.copy(SNAP_PATH, snap_path)
+    snap = gizio.load(snap_path.parent)
+    path = snap.export_cache(snap_path.parent)
+    assert path.name == "snapshot_600.gizio.hdf5"
+    assert gizio.load(snap_path.parent).paths == [snap_path]
+    with pytest.raises(ValueError):
+        snap.export_cache(snap_path)
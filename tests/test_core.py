@@ -1,7 +1,10 @@
 from collections import OrderedDict
+from copy import copy
 from pathlib import Path
 
 from astropy.cosmology import LambdaCDM
+import numpy as np
+import pytest
 from unyt import UnitRegistry
 from unyt import unyt_array
 from unyt import unyt_quantity
@@ -38,6 +41,10 @@ def test_snapshot():
     assert isinstance(snap.spec, gizio.spec.SpecBase)
     assert isinstance(snap.header, dict)
     assert isinstance(snap.shape, OrderedDict)
+    assert isinstance(snap.file_shapes, list)
+    assert len(snap.file_shapes) == len(snap.paths)
+    for ptype, n_part in snap.shape.items():
+        assert sum(shape[ptype] for shape in snap.file_shapes) == n_part
     assert isinstance(snap.cosmology, LambdaCDM)
     assert isinstance(snap.unit_registry, UnitRegistry)
     assert isinstance(snap.pt, dict)
@@ -51,6 +58,7 @@ def test_snapshot():
         assert len(key) == 2
         data = snap[key]
         assert isinstance(data, unyt_array)
+        assert len(data) == snap.shape[key[0]]
         assert key in snap.cached_keys()
     assert tuple(snap.cached_keys()) == tuple(snap.keys())
     for key in snap.keys():
@@ -78,7 +86,9 @@ def test_particle_selector():
     for ps in snap.pt.values():
         assert isinstance(gas.snap, Snapshot)
         assert isinstance(gas.pmask, OrderedDict)
+        assert isinstance(gas.masks, OrderedDict)
         assert isinstance(gas.shape, OrderedDict)
+        assert isinstance(gas.offsets, OrderedDict)
 
     # Test field system
     for key in gas.keys():
@@ -97,3 +107,199 @@ def test_particle_selector():
     assert len(baryon - gas) == len(star)
     assert isinstance(baryon ^ gas, ParticleSelector)
     assert len(baryon ^ gas) == len(star)
+    assert baryon.offsets["PartType4"] == (len(gas), len(gas) + len(star))
+    assert hot_gas.masks["PartType0"].count == len(hot_gas)
+    assert hot_gas.pmask["PartType0"].sum() == len(hot_gas)
+
+
+def test_partial_read():
+    """Test selection-aware partial reads."""
+    snap = gizio.load(SNAP_PATH)
+    key = ("PartType0", "Masses")
+    mask = np.zeros(snap.shape["PartType0"], dtype=bool)
+    mask[10:20] = True
+    mask[::1000] = True
+    assert np.all(snap.read(key, mask) == snap.read(key)[mask])
+    assert len(snap.cached_keys()) == 0
+
+    # Sparse selectors read only selected rows without caching full fields
+    gas = snap.pt["gas"][mask]
+    assert np.all(gas["m"] == snap.read(key, mask))
+    assert key not in snap.cached_keys()
+
+
+def test_inherit_cache():
+    """Test derived selectors inheriting cached fields."""
+    snap = gizio.load(SNAP_PATH, stats=True)
+    gas = snap.pt["gas"]
+    star = snap.pt["star"]
+    t = gas["t"].to_value("K")
+    gas["m"]
+    star["m"]
+    hot_gas = gas[t > 1e5]
+    cold_gas = gas[t < 1e4]
+    # Inherited on first access, without recomputing
+    assert "t" not in hot_gas._field_cache
+    derived = snap.stats().stages["derived"].calls
+    assert np.all(hot_gas["t"] == gas["t"][t > 1e5])
+    assert snap.stats().stages["derived"].calls == derived
+    assert "t" in hot_gas._field_cache
+    for ps in [hot_gas | cold_gas, hot_gas ^ (gas - cold_gas), gas | star]:
+        assert "m" not in ps._field_cache
+        assert ps["m"] is ps._field_cache.peek("m")
+        expected = copy(ps)
+        expected.clear_cache()
+        assert np.all(ps["m"] == expected["m"])
+
+
+def test_inherit_cache_sources():
+    """Test derived selectors holding no chains of sources."""
+    snap = gizio.load(SNAP_PATH)
+    gas = snap.pt["gas"]
+    rho = gas["rho"].d
+    gas["m"]
+    rng = np.random.default_rng(0)
+    acc = gas[rho > np.median(rho)]
+    for _ in range(20):
+        acc |= gas[rng.random(len(gas)) < 0.05]
+        acc["m"]
+        acc["rho"]
+    expected = copy(acc)
+    assert np.all(acc["rho"] == expected["rho"])
+    assert all(not source._sources for source in acc._sources)
+    retained = sum(
+        value.nbytes
+        for source in acc._sources
+        for value in source._field_cache.values()
+    )
+    assert retained <= gas["m"].nbytes + gas["rho"].nbytes
+
+    # Sources are released once every field is accessed
+    for key in acc.keys():
+        acc[key]
+    assert acc._sources == []
+
+
+def test_lazy():
+    """Test lazy fields backed by Dask arrays."""
+    pytest.importorskip("dask")
+    snap = gizio.load(SNAP_PATH, lazy=True)
+    eager = gizio.load(SNAP_PATH)
+    gas = snap.pt["gas"]
+    m = gas["m"]
+    assert m.units == eager.pt["gas"]["m"].units
+    assert np.all(m.compute() == eager.pt["gas"]["m"])
+    hot_gas = gas[gas["t"] > 1e5]
+    expected = eager.pt["gas"][eager.pt["gas"]["t"].to_value("K") > 1e5]
+    assert np.allclose(hot_gas["t"].compute(), expected["t"])
+    assert np.allclose(hot_gas["m"].sum().compute(), expected["m"].sum())
+    assert snap.memory_usage()["total"] == 0
+
+    # Graph keys depend on the served dtype
+    key = ("PartType0", "Masses")
+    double = gizio.load(SNAP_PATH, lazy=True, dtype="float64")
+    assert snap[key].name != double[key].name
+    assert double[key].dtype == np.float64
+
+    # Building lazy fields is timed, reading them is not
+    snap = gizio.load(SNAP_PATH, lazy=True, stats=True)
+    snap[key].compute()
+    assert snap.stats().stages["graph"].calls == 1
+    assert "read" not in snap.stats().stages
+
+
+def test_mmap():
+    """Test memory-mapped fields."""
+    snap = gizio.load(SNAP_PATH, mmap=True)
+    eager = gizio.load(SNAP_PATH)
+    key = ("PartType0", "Coordinates")
+    assert snap.mappable(key)
+    assert not eager.mappable(key)
+    for other in snap.keys():
+        assert np.all(snap[other] == eager[other])
+    assert snap.memory_usage()["total"] == 0
+
+    # Selectors get private mappings
+    gas = snap.pt["gas"]
+    gas["p"][0] = -1.0
+    assert np.all(snap[key][0] == eager[key][0])
+    mask = np.zeros(snap.shape["PartType0"], dtype=bool)
+    mask[::7] = True
+    assert np.all(snap.read(key, mask) == eager.read(key, mask))
+
+
+def test_iter_chunks():
+    """Test chunked streaming over fields."""
+    snap = gizio.load(SNAP_PATH)
+    fields = ["Coordinates", "Masses"]
+    chunks = list(snap.iter_chunks("PartType0", fields, chunk_size=100000))
+    for chunk in chunks:
+        assert isinstance(chunk["Masses"], unyt_array)
+        assert len(chunk["Coordinates"]) == len(chunk["Masses"]) <= 100000
+    masses = np.concatenate([chunk["Masses"] for chunk in chunks])
+    assert np.all(masses == snap.read(("PartType0", "Masses")))
+
+    # Selector chunks respect masks
+    gas = snap.pt["gas"]
+    hot_gas = gas[gas["t"].to_value("K") > 1e5]
+    chunks = list(hot_gas.iter_chunks(["m", "p"], chunk_size=100000))
+    masses = np.concatenate([chunk["m"] for chunk in chunks])
+    assert np.all(masses == hot_gas["m"])
+
+
+def test_dtype():
+    """Test dtype policies of fields."""
+    native = gizio.load(SNAP_PATH)
+    key = ("PartType0", "Coordinates")
+    assert native[key].dtype == np.float64
+    assert native.pt["star"]["age"].dtype == np.float32
+
+    snap = gizio.load(SNAP_PATH, dtype="downcast", field_dtypes={"t": "f8"})
+    gas = snap.pt["gas"]
+    assert snap[key].dtype == np.float32
+    assert gas["p"].dtype == np.float32
+    assert gas["id"].dtype == native.pt["gas"]["id"].dtype
+    assert gas["t"].dtype == np.float64
+    assert np.allclose(gas["p"], native[key])
+
+    snap = gizio.load(SNAP_PATH, mmap=True, field_dtypes={"p": "float32"})
+    assert not snap.mappable(key)
+    assert snap[key].dtype == np.float32
+    mask = np.zeros(snap.shape["PartType0"], dtype=bool)
+    mask[::7] = True
+    assert snap.read(key, mask).dtype == np.float32
+    snap = gizio.load(SNAP_PATH, dtype="upcast")
+    assert snap.pt["gas"]["m"].dtype == np.float64
+    assert snap.pt["star"]["age"].dtype == np.float64
+
+
+def test_column(monkeypatch):
+    """Test column-subset keys of multi-component fields."""
+    snap = gizio.load(SNAP_PATH)
+    full = gizio.load(SNAP_PATH)[("PartType0", "Metallicity")]
+    key = ("PartType0", "Metallicity", 1)
+    assert np.all(snap[key] == full[:, 1])
+    assert snap[key].units == full.units
+    assert tuple(snap.cached_keys()) == (key,)
+    mask = np.zeros(snap.shape["PartType0"], dtype=bool)
+    mask[10:20] = True
+    mask[::100] = True
+    assert np.all(snap.read(key, mask) == full[mask, 1])
+    chunks = list(snap.iter_chunks("PartType0", [key[1:]], chunk_size=300))
+    assert np.all(np.concatenate([c[key[1:]] for c in chunks]) == full[:, 1])
+    # Scattered selections are scanned in bounded blocks
+    with monkeypatch.context() as m:
+        m.setattr(gizio.core, "_MAX_HYPERSLABS", 1)
+        assert np.all(snap.read(key, mask) == full[mask, 1])
+    with pytest.raises(KeyError):
+        snap["PartType0", "Metallicity", 11]
+
+    # Component aliases read single columns
+    gas = snap.pt["gas"]
+    assert np.all(gas["z_he"] == full[:, 1])
+    assert np.all(gas["vz"] == gizio.load(SNAP_PATH).pt["gas"]["v"][:, 2])
+    gas["t"]
+    assert ("PartType0", "Metallicity") not in snap.cached_keys()
+    chunks = list(gas.iter_chunks(["z_he", "m"], chunk_size=300))
+    z_he = np.concatenate([chunk["z_he"] for chunk in chunks])
+    assert np.all(z_he == full[:, 1])
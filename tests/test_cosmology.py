@@ -0,0 +1,22 @@
+from astropy.cosmology import LambdaCDM
+import numpy as np
+
+from gizio.cosmology import AgeTable, age_table
+
+
+def test_age_table():
+    """Test AgeTable class."""
+    cosmology = LambdaCDM(70.2, 0.272, 0.728)
+    table = age_table(cosmology)
+    assert isinstance(table, AgeTable)
+    assert age_table(LambdaCDM(70.2, 0.272, 0.728)) is table
+
+    # Documented accuracy bound
+    a = np.linspace(1e-3, 1, 10000)
+    t = table(a)
+    assert np.all(np.diff(t) > 0)
+    assert np.max(np.abs(t / table.exact(a) - 1)) < 1e-6
+
+    # Scalars and values outside the grid
+    assert np.isclose(table(0.5), table.exact(0.5))
+    assert np.all(table([1e-5, 2.0]) == table.exact([1e-5, 2.0]))
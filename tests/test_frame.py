@@ -0,0 +1,86 @@
+from pathlib import Path
+import pickle
+
+import h5py
+import numpy as np
+
+import gizio
+from gizio.frame import Frame, bulk_velocity, disk_rotation, shrinking_sphere
+from gizio.synthetic import write_snapshot
+
+SNAP_PATH = (
+    Path(__file__).parent / "data/FIRE_M12i_ref11/snapshot_600.hdf5"
+).resolve()
+
+
+def test_frame():
+    """Test Frame class kernels."""
+    frame = Frame([1.0, 1.0, 5.0], [0.0, 0.0, 1.0], box_size=10.0)
+    p = np.array([[9.5, 1.0, 5.0], [1.0, 3.0, 5.0]])
+    v = np.array([[0.0, 1.0, 1.0], [1.0, 0.0, 3.0]])
+    assert np.allclose(frame.relative_positions(p), [[-1.5, 0, 0], [0, 2, 0]])
+    assert np.allclose(frame.radii(p), [1.5, 2.0])
+    assert np.allclose(frame.radial_velocities(p, v), [0.0, 0.0])
+    L = frame.angular_momenta(np.array([1.0, 2.0]), p, v)
+    assert np.allclose(L, [[0, 0, -1.5], [8, 0, -4]])
+    rotated = Frame(frame.center, frame.velocity, np.eye(3)[[1, 2, 0]], 10.0)
+    assert rotated.rotated and not frame.rotated
+    assert np.allclose(
+        rotated.relative_positions(p), [[0, 0, -1.5], [2, 0, 0]]
+    )
+    assert rotated != frame
+
+
+def test_selector_frame():
+    """Test frame fields of particle selectors."""
+    snap = gizio.load(SNAP_PATH)
+    gas = snap.pt["gas"]
+    center = np.median(gas["p"].d, axis=0)
+    gas.set_frame(center)
+    r = gas["r"]
+    box_size = snap.header["box_size"].to_value("code_length")
+    delta = gas["p"].d - center
+    delta -= box_size * np.round(delta / box_size)
+    assert np.allclose(r.d, np.linalg.norm(delta, axis=1))
+    assert "r" in gas._field_cache
+
+    inner_gas = gas[r.d < np.median(r.d)]
+    assert inner_gas.frame == gas.frame
+    assert np.all(inner_gas["r"] == r[r.d < np.median(r.d)])
+    assert len(pickle.loads(pickle.dumps(inner_gas))["p_rel"]) == len(
+        inner_gas
+    )
+
+    gas.set_frame(center + 1.0)
+    assert "r" not in gas._field_cache
+    assert not np.allclose(gas["r"], r)
+    gas.frame = None
+    assert "r" not in gas.keys()
+    assert "r" not in (inner_gas | gas).keys()
+
+
+def test_estimators(tmp_path):
+    """Test center, velocity and rotation estimators."""
+    paths = write_snapshot(tmp_path / "snapshot", {"star": 2000}, seed=1)
+    rng = np.random.default_rng(0)
+    center = np.array([999.0, 2.0, 500.0])
+    velocity = np.array([50.0, -20.0, 10.0])
+    # A thin disk rotating about the y axis, across the box boundary
+    delta = rng.normal(0, 2.0, (2000, 3))
+    delta[:, 1] *= 0.05
+    with h5py.File(paths[0], "r+") as f:
+        f["PartType4/Coordinates"][...] = (center + delta) % 1000
+        f["PartType4/Velocities"][...] = (
+            np.cross([0.0, 1.0, 0.0], delta) + velocity
+        )
+
+    star = gizio.load(paths[0]).pt["star"]
+    found = shrinking_sphere(star)
+    assert np.allclose((found - center + 500) % 1000 - 500, 0, atol=0.3)
+    found_velocity = bulk_velocity(star, found, 5.0)
+    assert np.allclose(found_velocity, velocity, atol=0.5)
+    rotation = disk_rotation(star, found, found_velocity, 5.0)
+    assert np.allclose(rotation[2], [0, 1, 0], atol=0.05)
+    star.set_frame(found, found_velocity, rotation)
+    assert np.abs(star["p_rel"].d[:, 2]).std() < 0.2
+    assert np.abs(star["v_r"].d).max() < 0.5
@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+import gizio
+from gizio.ids import IDIndex
+from gizio.synthetic import write_snapshot
+
+
+SNAP_PATH = (
+    Path(__file__).parent / "data/FIRE_M12i_ref11/snapshot_600.hdf5"
+).resolve()
+
+
+def test_id_index():
+    """Test IDIndex class."""
+    index = IDIndex(np.array([5, 3, 5, 7, 3, 3]))
+    assert len(index) == 6
+    assert np.all(index.rows([3, 9]) == [1, 4, 5])
+    assert np.all(index.rows([5, 5]) == [0, 2])
+    start, count = index.ranges([7, 3, 1])
+    assert np.all(count == [1, 3, 0])
+    assert np.all(index.gather(start, count) == [3, 1, 4, 5])
+
+
+def test_select_ids():
+    """Test selecting and matching particles by ID."""
+    snap = gizio.load(SNAP_PATH)
+    gas = snap.pt["gas"]
+    ids = gas["id"].d[::7]
+    ps = snap.pt["all"].select_ids(ids)
+    assert len(ps) == len(ids)
+    assert np.all(np.sort(ps["id"].d) == np.sort(ids))
+
+    other = gizio.load(SNAP_PATH)
+    hot_gas = other.pt["gas"][other.pt["gas"]["t"].to_value("K") > 1e5]
+    index_a, index_b = gizio.match(snap.pt["all"], hot_gas)
+    assert len(index_b) == len(hot_gas)
+    assert np.all(snap.pt["all"]["id"][index_a] == hot_gas["id"][index_b])
+
+
+def test_id_sidecar(tmp_path):
+    """Test persisted ID indices and duplicate IDs."""
+    path = write_snapshot(tmp_path / "snapshot_000", {"gas": 100})[0]
+    with h5py.File(path, "r+") as h5f:
+        # Split particles share IDs
+        ids = h5f["PartType0/ParticleIDs"]
+        ids[:3] = ids[3:6]
+    snap = gizio.load(path, id_sidecar=True)
+    index = snap.id_index("PartType0")
+    assert Path(snap.prefix + ".PartType0.ids.npz").exists()
+    snap = gizio.load(path, id_sidecar=True)
+    assert np.all(snap.id_index("PartType0").rows([5]) == index.rows([5]))
+    assert snap.cached_keys() == []
+
+    gas = snap.pt["gas"]
+    assert len(gas.select_ids(gas["id"][:3])) == 6
+    first = np.zeros(len(gas), dtype=bool)
+    first[:6] = True
+    index_a, index_b = gizio.match(gas[first], gas)
+    assert len(index_a) == 12
+    assert np.all(gas["id"][index_a] == gas["id"][index_b])
@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import numpy as np
+from unyt import unyt_array
+
+import gizio
+from gizio.kernel import FieldKernel
+
+
+SNAP_PATH = (
+    Path(__file__).parent / "data/FIRE_M12i_ref11/snapshot_600.hdf5"
+).resolve()
+
+
+def test_field_kernel():
+    """Test FieldKernel class."""
+    snap = gizio.load(SNAP_PATH)
+    gas = snap.pt["gas"]
+
+    def specific_energy(m, u):
+        return m * u
+
+    # Units keeping float32 products in range
+    unit = "Msun * km**2 / s**2"
+    inputs = [("m", "Msun"), ("u", "km**2 / s**2")]
+    kernel = FieldKernel(specific_energy, inputs, unit, chunk_size=1000)
+    energy = kernel(gas)
+    assert isinstance(energy, unyt_array)
+    assert energy.dtype == gas["u"].dtype
+    assert np.isfinite(energy.d).all()
+    expected = (gas["m"] * gas["u"]).to_value(unit)
+    assert np.allclose(energy.to_value(unit), expected, rtol=1e-5)
+
+    # Registered kernels and column inputs
+    gas.register_field("he", lambda z_he: z_he, [(("z", 1), None)], "")
+    assert np.all(gas["he"].d == gas["z"].d[:, 1])
+    cond = gas["he"].d > 0.25
+    assert len(gas[cond]["he"]) == cond.sum()
@@ -0,0 +1,44 @@
+from operator import and_, or_, sub, xor
+
+import numpy as np
+
+from gizio.mask import Mask
+
+
+def test_mask():
+    """Test Mask class against boolean arrays."""
+    rng = np.random.default_rng(0)
+    n = 10001
+    arrays = [
+        np.ones(n, dtype=bool),
+        rng.random(n) < 0.5,
+        rng.random(n) < 0.001,
+        np.zeros(n, dtype=bool),
+    ]
+    masks = [Mask.from_bool(array) for array in arrays]
+    assert [mask.kind for mask in masks] == ["full", "bits", "index", "index"]
+    for array, mask in zip(arrays, masks):
+        assert mask.count == array.sum()
+        assert np.all(mask.to_bool() == array)
+        assert np.all(mask.indices() == np.flatnonzero(array))
+        assert np.all(mask.block(100, 5000) == array[100:5000])
+        assert mask.count_between(100, 5000) == array[100:5000].sum()
+        starts, stops = mask.runs(100, 5000)
+        block = np.zeros(4900, dtype=bool)
+        for start, stop in zip(starts, stops):
+            block[start:stop] = True
+        assert np.all(block == array[100:5000])
+        cond = rng.random(mask.count) < 0.5
+        expected = array.copy()
+        expected[expected] = cond
+        assert np.all(mask.where(cond).to_bool() == expected)
+
+    # Set operations
+    for op in [or_, and_, sub, xor]:
+        for array1, mask1 in zip(arrays, masks):
+            for array2, mask2 in zip(arrays, masks):
+                if op is sub:
+                    expected = array1 & ~array2
+                else:
+                    expected = op(array1, array2)
+                assert np.all(op(mask1, mask2).to_bool() == expected)
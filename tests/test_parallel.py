@@ -0,0 +1,45 @@
+from pathlib import Path
+import pickle
+
+import numpy as np
+
+import gizio
+
+
+SNAP_PATH = (
+    Path(__file__).parent / "data/FIRE_M12i_ref11/snapshot_600.hdf5"
+).resolve()
+
+
+def total_mass(ps):
+    return ps["m"].sum().to_value("Msun")
+
+
+def test_pickle():
+    """Test pickling snapshots and particle selectors without caches."""
+    snap = gizio.load(SNAP_PATH)
+    gas = snap.pt["gas"]
+    hot_gas = gas[gas["t"].to_value("K") > 1e5]
+    hot_gas["m"]
+    data = pickle.dumps(hot_gas)
+    other = pickle.loads(data)
+    assert other.snap.paths == snap.paths
+    assert other.snap.cached_keys() == []
+    assert "m" not in other._field_cache
+    assert len(other) == len(hot_gas)
+    assert other.keys() == hot_gas.keys()
+    assert np.all(other["m"] == hot_gas["m"])
+    assert np.allclose(other["t"], hot_gas["t"])
+
+
+def test_parallel_map():
+    """Test mapping over particle selectors in worker processes."""
+    snap = gizio.load(SNAP_PATH)
+    gas = snap.pt["gas"]
+    t = gas["t"].to_value("K")
+    selectors = [gas[t < 1e4], gas[t > 1e5], snap.pt["star"]]
+    expected = [total_mass(ps) for ps in selectors]
+    assert gizio.parallel_map(total_mass, selectors, n_workers=1) == expected
+    assert np.allclose(
+        gizio.parallel_map(total_mass, selectors, n_workers=2), expected
+    )
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import h5py
+
+import gizio
+from gizio.pool import FilePool
+
+
+SNAP_PATH = (
+    Path(__file__).parent / "data/FIRE_M12i_ref11/snapshot_600.hdf5"
+).resolve()
+
+
+def test_file_pool():
+    """Test FilePool class."""
+    pool = FilePool([SNAP_PATH], max_open=1, chunk_cache={"rdcc_w0": 0.5})
+    assert len(pool) == 1
+    assert pool.n_open == 0
+    with pool.get(0) as f:
+        assert isinstance(f, h5py.File)
+        handle = f
+    assert pool.n_open == 1
+    with pool.get(0) as f:
+        assert f is handle
+    pool.close()
+    assert pool.n_open == 0
+    with pool:
+        with pool.get(0) as f:
+            assert f.id.valid
+    assert pool.n_open == 0
+
+
+def test_file_pool_map():
+    """Test ordered, threaded FilePool.map."""
+    paths = [SNAP_PATH] * 4
+    pool = FilePool(paths, max_open=2, n_workers=3)
+    assert pool.map(lambda index, f: index) == [0, 1, 2, 3]
+    assert pool.map(lambda index, f: index, [3, 1]) == [3, 1]
+    assert pool.n_open <= 2
+
+
+def test_snapshot_file_pool():
+    """Test Snapshot reads through its file pool."""
+    with gizio.load(SNAP_PATH, max_open_files=1) as snap:
+        assert isinstance(snap.files, FilePool)
+        snap.keys()
+        snap["PartType0", "Masses"]
+        assert snap.files.n_open == 1
+    assert snap.files.n_open == 0
+    # Files are reopened on demand after closing
+    snap["PartType0", "Density"]
+    snap.close()
+
+    # Threaded reads give identical results
+    snap = gizio.load(SNAP_PATH, n_workers=2)
+    key = ("PartType0", "Masses")
+    assert (snap[key] == snap.read(key)).all()
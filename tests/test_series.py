@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import gizio
+from gizio.core import Snapshot
+from gizio.series import SnapshotSeries
+
+
+SNAP_PATH = (
+    Path(__file__).parent / "data/FIRE_M12i_ref11/snapshot_600.hdf5"
+).resolve()
+
+
+def test_series():
+    """Test snapshot series with prefetch."""
+    fields = [("gas", "t"), ("PartType4", "Masses")]
+    with gizio.load_series([SNAP_PATH] * 4, fields=fields) as series:
+        assert isinstance(series, SnapshotSeries)
+        assert len(series) == 4
+        snaps = []
+        for index, snap in enumerate(series):
+            assert isinstance(snap, Snapshot)
+            assert snap.spec is series.spec
+            assert len(series.resident) <= series.window
+            assert index in series.resident
+            snaps += [snap]
+        assert snaps[0].cosmology is snaps[-1].cosmology
+
+        # The next snapshot is read ahead
+        series[1]
+        assert series.resident == [1, 2]
+        snap = series[2]
+        assert series.resident == [2, 3]
+        assert "t" in snap.pt["gas"]._field_cache
+        assert ("PartType4", "Masses") in snap.cached_keys()
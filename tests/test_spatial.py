@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import numpy as np
+
+import gizio
+from gizio.core import ParticleSelector
+from gizio.spatial import SpatialIndex
+
+
+SNAP_PATH = (
+    Path(__file__).parent / "data/FIRE_M12i_ref11/snapshot_600.hdf5"
+).resolve()
+
+
+def test_spatial_index():
+    """Test SpatialIndex class against brute force."""
+    rng = np.random.default_rng(0)
+    box_size = 100.0
+    positions = rng.uniform(0, box_size, (10000, 3))
+    index = SpatialIndex(positions, box_size)
+    assert index.periodic
+
+    # Sphere across the periodic boundary
+    center = np.array([1.0, 50.0, 99.0])
+    delta = positions - center
+    delta -= box_size * np.round(delta / box_size)
+    r2 = (delta ** 2).sum(axis=1)
+    expected = np.flatnonzero((r2 < 10.0 ** 2) & (r2 >= 5.0 ** 2))
+    assert np.all(index.query_sphere(center, 10.0, 5.0) == expected)
+
+    # Box across the periodic boundary
+    lo = np.array([-10.0, 20.0, 30.0])
+    hi = np.array([10.0, 40.0, 50.0])
+    delta = positions - (lo + hi) / 2
+    delta -= box_size * np.round(delta / box_size)
+    inside = (delta >= -(hi - lo) / 2) & (delta < (hi - lo) / 2)
+    expected = np.flatnonzero(inside.all(axis=1))
+    assert np.all(index.query_box(lo, hi) == expected)
+
+    # Non-periodic index
+    index = SpatialIndex(positions)
+    assert not index.periodic
+    r2 = ((positions - center) ** 2).sum(axis=1)
+    expected = np.flatnonzero(r2 < 10.0 ** 2)
+    assert np.all(index.query_sphere(center, 10.0) == expected)
+
+
+def test_region_selection():
+    """Test region selectors on ParticleSelector."""
+    snap = gizio.load(SNAP_PATH)
+    gas = snap.pt["gas"]
+    center = gas["p"][0]
+    radius = snap.quantity(100, "kpc")
+    sphere = gas.sphere(center, radius)
+    assert isinstance(sphere, ParticleSelector)
+    box_size = snap.header["box_size"]
+    delta = sphere["p"] - center
+    delta -= box_size * np.round(delta / box_size)
+    distance = np.sqrt((delta ** 2).sum(axis=1))
+    assert np.all(distance < radius)
+    shell = gas.shell(center, radius / 2, radius)
+    assert len(shell) < len(sphere)
+    assert len(sphere & gas.sphere(center, radius / 2)) == len(sphere) - len(
+        shell
+    )
+    box = gas.box(center - radius, center + radius)
+    assert len(sphere - box) == 0
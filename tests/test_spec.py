@@ -1,3 +1,5 @@
+import numpy as np
+
 import gizio
 from gizio.spec import SPEC_REGISTRY
 
@@ -5,3 +7,12 @@ from gizio.spec import SPEC_REGISTRY
 def test_gizmo_spec():
     snap = gizio.load("data/FIRE_M12i_ref11", spec="gizmo")
     assert isinstance(snap.spec, SPEC_REGISTRY["gizmo"])
+
+
+def test_compute_age():
+    snap = gizio.load("data/FIRE_M12i_ref11", spec="gizmo")
+    star = snap.pt["star"]
+    age = star["age"]
+    exact_age = snap.spec.compute_age(star, exact=True)
+    assert age.units == exact_age.units
+    assert np.max(np.abs(age - exact_age).to_value("Gyr")) < 1e-4
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+import pytest
+
+import gizio
+from gizio.stats import Event
+
+
+SNAP_PATH = (
+    Path(__file__).parent / "data/FIRE_M12i_ref11/snapshot_600.hdf5"
+).resolve()
+
+
+def test_stats():
+    """Test I/O and compute statistics."""
+    with pytest.raises(ValueError):
+        gizio.load(SNAP_PATH).stats()
+
+    events = []
+    snap = gizio.load(SNAP_PATH, stats=events.append)
+    gas = snap.pt["gas"]
+    gas["m"]
+    gas["m"]
+    gas["t"]
+    stats = snap.stats()
+    assert all(isinstance(event, Event) for event in events)
+    assert len(events) == sum(stage.calls for stage in stats.stages.values())
+    for stage in ["apply_to", "open", "read", "getitem", "field", "derived"]:
+        assert stats.stages[stage].calls > 0
+    key = ("PartType0", "Masses")
+    assert stats.fields[key].nbytes == snap[key].nbytes
+    assert stats.fields["m"].calls == 2
+    assert stats.fields["m"].hits == 1
+    assert stats.fields["m"].misses == 1
+    assert stats.stages["read"].nbytes == sum(
+        snap[key].nbytes for key in snap.cached_keys()
+    )
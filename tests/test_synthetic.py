@@ -0,0 +1,37 @@
+import numpy as np
+
+import gizio
+from gizio.synthetic import write_snapshot
+
+
+def test_write_snapshot(tmp_path):
+    """Test writing synthetic snapshots."""
+    n_part = {"gas": 1000, "hdm": 500, "star": 100, "bh": 2}
+    paths = write_snapshot(tmp_path / "single/snapshot_000", n_part)
+    assert len(paths) == 1
+    snap = gizio.load(paths[0])
+    assert snap.shape["PartType0"] == 1000
+    assert snap.shape["PartType2"] == 0
+    assert len(np.unique(snap.pt["all"]["id"])) == len(snap.pt["all"])
+    assert np.all(snap.pt["gas"]["t"] > 0)
+    assert np.all(snap.pt["star"]["age"] > 0)
+
+    # File splits, chunking and compression keep the data
+    paths = write_snapshot(
+        tmp_path / "multi/snapshot_000",
+        [1000, 500, 0, 0, 100, 2],
+        n_file=3,
+        chunks=64,
+        compression="gzip",
+    )
+    assert len(paths) == 3
+    multi = gizio.load(tmp_path / "multi/snapshot_000")
+    assert multi.shape == snap.shape
+    assert multi.keys() == snap.keys()
+    assert multi.header["n_file"] == 3
+    assert sorted(multi.pt["all"]["id"]) == sorted(snap.pt["all"]["id"])
+    assert not multi.mappable(("PartType0", "Masses"))
+
+    # Stars form before the snapshot time
+    paths = write_snapshot(tmp_path / "early/snapshot_000", n_part, a=0.5)
+    assert np.all(gizio.load(paths[0]).pt["star"]["age"] >= 0)